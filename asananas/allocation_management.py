@@ -1,9 +1,15 @@
 import re
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 
 import pandas as pd
 import plotly.express as px
 
+from asananas.instrumentation import metrics
+from asananas.schema import parse_date
+
+ALLOCATION_PATTERN = r"([A-Za-z]+): ([0-9]+)(%|d)"
+
 
 def _get_all_work_days(t1, t2, n_workdays_per_week):
     dates = []
@@ -14,53 +20,90 @@ def _get_all_work_days(t1, t2, n_workdays_per_week):
     return dates
 
 
-def extract_allocation_data(df_asana_tasks, n_workdays_per_week=5):
+def _week_label(date):
+    return f"{date.isocalendar().year}-CW{date.isocalendar().week:02d}"
 
-    projects_with_no_allocation = []
-    projects_with_broken_allocation = []
 
+def _extract_task_allocation(row, n_workdays_per_week=5):
+    # skip tasks with no allocation
+    if pd.isna(row.asana_allocation):
+        return [], "no_allocation"
+
+    # decode allocation
+    allocations = re.findall(ALLOCATION_PATTERN, row.asana_allocation)
+    if len(allocations) == 0:
+        return [], "broken_allocation"
+
+    # dates are parsed at ingestion already, see asananas.schema, but tasks
+    # without a (valid) timeline cannot be allocated
+    try:
+        t1 = parse_date(row.asana_start_on)
+        t2 = parse_date(row.asana_due_on)
+    except ValueError:
+        return [], "broken_allocation"
+    if t1 is None or t2 is None:
+        return [], "broken_allocation"
+
+    dates = _get_all_work_days(
+        t1.to_pydatetime(), t2.to_pydatetime(), n_workdays_per_week=n_workdays_per_week
+    )
+
+    # build up data
     data = []
+    for date in dates:
 
-    for _, row in df_asana_tasks.iterrows():
+        for allocation_info in allocations:
 
-        # skip tasks with no allocation
-        if row.asana_allocation is None:
-            projects_with_no_allocation.append(row.asana_task_name)
-            continue
+            allocation_value = float(allocation_info[1])
+            allocation_unit = allocation_info[2]
+
+            if allocation_unit == "%":
+                allocation = allocation_value / 100
+            elif allocation_unit == "d":
+                allocation = allocation_value / len(dates)
+
+            data.append(
+                {
+                    "date": date,
+                    "name": allocation_info[0],
+                    "allocation": allocation,
+                    "project": row.asana_task_name,
+                }
+            )
+
+    return data, None
+
+
+def _iter_batches(df_asana_tasks):
+    # a single frame or an iterable of frames, e.g. from
+    # AsanaConnector.iter_task_batches
+    if isinstance(df_asana_tasks, pd.DataFrame):
+        return [df_asana_tasks]
+    return df_asana_tasks
+
+
+@metrics.timed("allocation.extract_allocation_data")
+def extract_allocation_data(df_asana_tasks, n_workdays_per_week=5):
+
+    projects_with_no_allocation = []
+    projects_with_broken_allocation = []
 
-        # decode allocation
-        pattern = r"([A-Za-z]+): ([0-9]+)(%|d)"
-        allocations = re.findall(pattern, row.asana_allocation)
-        if len(allocations) == 0:
-            projects_with_broken_allocation.append(row.asana_task_name)
-            continue
+    data = []
 
-        # convert dates
-        t1 = datetime.strptime(row.asana_start_on, "%Y-%m-%d")
-        t2 = datetime.strptime(row.asana_due_on, "%Y-%m-%d")
-        dates = _get_all_work_days(t1, t2, n_workdays_per_week=n_workdays_per_week)
+    for df_batch in _iter_batches(df_asana_tasks):
 
-        # build up data
-        for date in dates:
+        for _, row in df_batch.iterrows():
 
-            for allocation_info in allocations:
+            task_data, error = _extract_task_allocation(row, n_workdays_per_week)
 
-                allocation_value = float(allocation_info[1])
-                allocation_unit = allocation_info[2]
+            if error == "no_allocation":
+                projects_with_no_allocation.append(row.asana_task_name)
+            elif error == "broken_allocation":
+                projects_with_broken_allocation.append(row.asana_task_name)
 
-                if allocation_unit == "%":
-                    allocation = allocation_value / 100
-                elif allocation_unit == "d":
-                    allocation = allocation_value / len(dates)
+            data.extend(task_data)
 
-                data.append(
-                    {
-                        "date": date,
-                        "name": allocation_info[0],
-                        "allocation": allocation,
-                        "project": row.asana_task_name,
-                    }
-                )
+    metrics.increment("allocation.rows", len(data))
 
     return (
         pd.DataFrame(data),
@@ -69,6 +112,120 @@ def extract_allocation_data(df_asana_tasks, n_workdays_per_week=5):
     )
 
 
+class AllocationModel:
+    """Incrementally maintained allocation data keyed by `asana_task_id`.
+
+    Every task's contribution to the per-person-per-week totals is stored
+    separately, so adding, removing or replacing a single task only touches
+    the person-weeks of that task instead of recomputing everything.
+    """
+
+    def __init__(self, n_workdays_per_week=5):
+        self.n_workdays_per_week = n_workdays_per_week
+
+        self._tasks = {}
+        self._rows_by_task = {}
+        self._weekly_by_task = {}
+        self._weekly_allocation = {}
+        self._errors_by_task = {}
+
+    @classmethod
+    def from_asana_tasks(cls, df_asana_tasks, n_workdays_per_week=5):
+        model = cls(n_workdays_per_week=n_workdays_per_week)
+        for df_batch in _iter_batches(df_asana_tasks):
+            for task in df_batch.to_dict("records"):
+                model.add_task(task)
+        return model
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, task_id):
+        return task_id in self._tasks
+
+    def _apply_weekly(self, weekly, sign):
+        for key, value in weekly.items():
+            total = self._weekly_allocation.get(key, 0.0) + sign * value
+            if abs(total) < 1e-12:
+                self._weekly_allocation.pop(key, None)
+            else:
+                self._weekly_allocation[key] = total
+
+    def add_task(self, task):
+        if task["asana_task_id"] in self._tasks:
+            return self.replace_task(task)
+
+        rows, error = _extract_task_allocation(
+            SimpleNamespace(**task), n_workdays_per_week=self.n_workdays_per_week
+        )
+
+        weekly = {}
+        for row in rows:
+            key = (row["name"], _week_label(row["date"]))
+            weekly[key] = (
+                weekly.get(key, 0.0) + row["allocation"] / self.n_workdays_per_week
+            )
+
+        task_id = task["asana_task_id"]
+        self._tasks[task_id] = task
+        self._rows_by_task[task_id] = rows
+        self._weekly_by_task[task_id] = weekly
+        if error is not None:
+            self._errors_by_task[task_id] = error
+
+        self._apply_weekly(weekly, +1)
+        return set(weekly)
+
+    def remove_task(self, task_id):
+        if task_id not in self._tasks:
+            return set()
+
+        weekly = self._weekly_by_task.pop(task_id)
+        del self._tasks[task_id]
+        del self._rows_by_task[task_id]
+        self._errors_by_task.pop(task_id, None)
+
+        self._apply_weekly(weekly, -1)
+        return set(weekly)
+
+    def replace_task(self, task):
+        person_weeks = self.remove_task(task["asana_task_id"])
+        return person_weeks | self.add_task(task)
+
+    def get_weekly_allocation(self, name, week):
+        return self._weekly_allocation.get((name, week), 0.0)
+
+    @property
+    def weekly_allocation(self):
+        return dict(self._weekly_allocation)
+
+    @property
+    def tasks(self):
+        return list(self._tasks.values())
+
+    @property
+    def df_allocation_data(self):
+        return pd.DataFrame(
+            [row for rows in self._rows_by_task.values() for row in rows]
+        )
+
+    def _projects_with_error(self, error):
+        return [
+            self._tasks[task_id]["asana_task_name"]
+            for task_id, e in self._errors_by_task.items()
+            if e == error
+        ]
+
+    @property
+    def projects_with_no_allocation(self):
+        return self._projects_with_error("no_allocation")
+
+    @property
+    def projects_with_broken_allocation(self):
+        return self._projects_with_error("broken_allocation")
+
+
+@metrics.timed("allocation.visualize_allocation_by_week")
 def visualize_allocation_by_week(
     df_allocation_data, n_workdays_per_week=5, current_date=None
 ):
@@ -88,9 +245,7 @@ def visualize_allocation_by_week(
     x1 = f"{t1.year}-CW{t1.isocalendar().week:02d}"
 
     # create the week field
-    df_allocation_data["week"] = df_allocation_data["date"].apply(
-        lambda x: f"{x.isocalendar().year}-CW{x.isocalendar().week:02d}"
-    )
+    df_allocation_data["week"] = df_allocation_data["date"].apply(_week_label)
 
     # group by name, project and week
     df_tmp = (
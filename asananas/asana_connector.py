@@ -1,12 +1,85 @@
 import os
+import threading
 import typing as t
 
 import asana
 import pandas as pd
+from loguru import logger
+
+from asananas.instrumentation import count_http_response, metrics
+from asananas.schema import apply_asana_task_schema, parse_date
+
+TASK_COLUMNS = [
+    "asana_task_id",
+    "asana_task_name",
+    "asana_start_on",
+    "asana_due_on",
+    "asana_completed",
+    "asana_assignee",
+    "asana_url",
+    "asana_linear_project",
+    "asana_section",
+    "asana_allocation",
+    "asana_modified_at",
+    "asana_linear_progress",
+    "asana_linear_state",
+    "asana_linear_url",
+]
+
+# custom fields written back from Linear, see write_back_linear_to_asana
+LINEAR_CUSTOM_FIELDS = {
+    "asana_linear_progress": "Linear Progress",
+    "asana_linear_state": "Linear State",
+    "asana_linear_url": "Linear URL",
+}
+
+# maximum number of actions per request of the asana batch api
+BATCH_SIZE = 10
+
+
+class _Client(asana.Client):
+    # single choke point for all requests, used to share a rate budget
+    rate_limiter = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # a rate limited or failed response is only known to be retried once
+        # the client decides to retry it, so it is counted afterwards
+        self._responses = threading.local()
+        self.session.hooks["response"].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        self._count_response(retried=False)
+        self._responses.last = response
+
+    def _count_response(self, retried):
+        response = getattr(self._responses, "last", None)
+        if response is not None:
+            self._responses.last = None
+            count_http_response("asana", response, retried=retried)
+
+    def _handle_retryable_error(self, e, retry_count):
+        self._count_response(retried=True)
+        return super()._handle_retryable_error(e, retry_count)
+
+    def request(self, method, path, **options):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        try:
+            return super().request(method, path, **options)
+        finally:
+            self._count_response(retried=False)
 
 
 class AsanaConnector:
-    def __init__(self, access_token: str = None):
+    def __init__(
+        self,
+        access_token: str = None,
+        base_url: str = None,
+        max_retries: int = None,
+        rate_limiter=None,
+    ):
 
         if access_token is None:
             access_token = os.getenv("ASANA_ACCESS_TOKEN")
@@ -14,7 +87,16 @@ class AsanaConnector:
         if access_token is None:
             raise Exception("No Asana access token provided")
 
-        self.client = asana.Client.access_token(access_token)
+        self.client = _Client.access_token(access_token)
+        self.client.rate_limiter = rate_limiter
+        if base_url is not None:
+            self.client.options["base_url"] = base_url
+        if max_retries is not None:
+            self.client.options["max_retries"] = max_retries
+
+        # task gid -> name -> gid and type of the custom fields of the task,
+        # the same field has a different gid in every workspace
+        self.custom_fields = {}
 
     def get_workspaces(self):
         return list(self.client.workspaces.find_all())
@@ -29,55 +111,139 @@ class AsanaConnector:
                     return membership["section"]["name"]
         return None
 
-    def _find_allocation(self, task_info):
+    def _find_custom_field(self, task_info, name):
         for custom_field in task_info["custom_fields"]:
-            if custom_field["name"] == "Allocation":
-                return custom_field["text_value"]
+            if custom_field["name"] == name:
+                self.custom_fields.setdefault(task_info["gid"], {})[name] = {
+                    "gid": custom_field["gid"],
+                    "resource_subtype": custom_field.get("resource_subtype"),
+                }
+                return custom_field
         return None
 
-    def get_all_tasks_for_project(self, project_id) -> t.List[t.Dict]:
-        task_infos = []
+    def get_custom_field(self, task_id, name) -> t.Optional[t.Dict]:
+        # only known for tasks which were fetched before
+        return self.custom_fields.get(task_id, {}).get(name)
+
+    def _custom_field_value(self, task_info, name):
+        custom_field = self._find_custom_field(task_info, name)
+        if custom_field is None:
+            return None
+        if custom_field.get("resource_subtype") == "number":
+            return custom_field.get("number_value")
+        return custom_field.get("display_value")
+
+    def _find_allocation(self, task_info):
+        custom_field = self._find_custom_field(task_info, "Allocation")
+        return None if custom_field is None else custom_field["text_value"]
+
+    def _is_member_of_project(self, task_info, project_id):
+        for membership in task_info["memberships"]:
+            if membership["project"]["gid"] == project_id:
+                return True
+        return False
+
+    def _normalize_task(self, task_info, project_id) -> t.Dict:
+        assignee = (
+            None if task_info["assignee"] is None else task_info["assignee"]["name"]
+        )
+        tags = [t["name"] for t in task_info["tags"]]
+
+        return {
+            "asana_task_id": task_info["gid"],
+            "asana_task_name": task_info["name"],
+            "asana_start_on": task_info["start_on"],
+            "asana_due_on": task_info["due_on"],
+            "asana_completed": task_info["completed"],
+            "asana_assignee": assignee,
+            "asana_url": task_info["permalink_url"],
+            "asana_linear_project": "Linear Project" in tags,
+            "asana_section": self._find_section_by_project_id(task_info, project_id),
+            "asana_allocation": self._find_allocation(task_info),
+            "asana_modified_at": task_info.get("modified_at"),
+            **{
+                column: self._custom_field_value(task_info, name)
+                for column, name in LINEAR_CUSTOM_FIELDS.items()
+            },
+        }
+
+    def get_task(self, task_id, project_id) -> t.Optional[t.Dict]:
+        task_info = self.client.tasks.get_task(task_id)
+
+        if task_info["resource_subtype"] != "default_task":
+            return None
+
+        if not self._is_member_of_project(task_info, project_id):
+            return None
+
+        task = self._normalize_task(task_info, project_id)
+        task["asana_start_on"] = parse_date(task["asana_start_on"])
+        task["asana_due_on"] = parse_date(task["asana_due_on"])
+        task["asana_modified_at"] = parse_date(task["asana_modified_at"])
+        return task
+
+    def create_webhook(self, resource_id, target_url):
+        return self.client.webhooks.create(
+            {"resource": resource_id, "target": target_url}
+        )
+
+    @metrics.timed("asana.batch_update_tasks")
+    def batch_update_tasks(self, updates: t.Dict[str, t.Dict]) -> t.Dict[str, int]:
+        # groups the task updates into as few batch api requests as possible and
+        # returns the status code of every single update
+        status_codes = {}
+        items = list(updates.items())
+        for i in range(0, len(items), BATCH_SIZE):
+            chunk = items[i : i + BATCH_SIZE]
+            actions = [
+                {"relative_path": f"/tasks/{task_id}", "method": "put", "data": data}
+                for task_id, data in chunk
+            ]
+            responses = self.client.batch_api.create_batch_request({"actions": actions})
+            for (task_id, _), response in zip(chunk, responses):
+                status_codes[task_id] = response["status_code"]
+                if response["status_code"] >= 400:
+                    logger.warning(
+                        f"Updating Asana task {task_id} failed: {response.get('body')}"
+                    )
+
+        metrics.increment("asana.batch_actions", len(items))
+        return status_codes
+
+    def iter_tasks(self, project_id) -> t.Iterator[t.Dict]:
+        # the project's task list is paginated lazily by the asana client, so
+        # tasks are yielded as soon as their page arrives
         for task in self.client.tasks.find_by_project(project_id):
             task_info = self.client.tasks.get_task(task["gid"])
 
             if task_info["resource_subtype"] != "default_task":
                 continue
 
-            assignee = (
-                None if task_info["assignee"] is None else task_info["assignee"]["name"]
-            )
-            tags = [t["name"] for t in task_info["tags"]]
-
-            task_infos.append(
-                {
-                    "asana_task_id": task_info["gid"],
-                    "asana_task_name": task_info["name"],
-                    "asana_start_on": task_info["start_on"],
-                    "asana_due_on": task_info["due_on"],
-                    "asana_completed": task_info["completed"],
-                    "asana_assignee": assignee,
-                    "asana_url": task_info["permalink_url"],
-                    "asana_linear_project": "Linear Project" in tags,
-                    "asana_section": self._find_section_by_project_id(
-                        task_info, project_id
-                    ),
-                    "asana_allocation": self._find_allocation(task_info),
-                }
-            )
+            metrics.increment("asana.tasks")
+            yield self._normalize_task(task_info, project_id)
+
+    def iter_task_batches(
+        self, project_id, batch_size: int = 50
+    ) -> t.Iterator[pd.DataFrame]:
+        # every batch gets its own categories, so pd.concat of the batches
+        # turns asana_assignee and asana_section into plain columns. Apply
+        # the schema again to the concatenated frame to get them back:
+        # apply_asana_task_schema(pd.concat(batches, ignore_index=True))
+        batch = []
+        for task in self.iter_tasks(project_id):
+            batch.append(task)
+            if len(batch) >= batch_size:
+                yield apply_asana_task_schema(pd.DataFrame(batch))
+                batch = []
+
+        if len(batch) > 0:
+            yield apply_asana_task_schema(pd.DataFrame(batch))
+
+    @metrics.timed("asana.get_all_tasks_for_project")
+    def get_all_tasks_for_project(self, project_id) -> pd.DataFrame:
+        task_infos = list(self.iter_tasks(project_id))
 
         if len(task_infos) == 0:
-            columns = [
-                "asana_task_id",
-                "asana_task_name",
-                "asana_start_on",
-                "asana_due_on",
-                "asana_completed",
-                "asana_assignee",
-                "asana_url",
-                "asana_linear_project",
-                "asana_section",
-                "asana_allocation",
-            ]
-            return pd.DataFrame(columns=columns)
+            return apply_asana_task_schema(pd.DataFrame(columns=TASK_COLUMNS))
 
-        return pd.DataFrame(task_infos)
+        return apply_asana_task_schema(pd.DataFrame(task_infos))
@@ -1,10 +1,11 @@
 import typing as t
-from datetime import datetime
 
 import pandas as pd
 from loguru import logger
 
-from asananas.asana_connector import AsanaConnector
+from asananas.asana_connector import LINEAR_CUSTOM_FIELDS, AsanaConnector
+from asananas.id_mapping import DEFAULT_ID_MAPPING_FILE, IdMappingIndex
+from asananas.instrumentation import metrics
 from asananas.linear_connector import LinearConnector
 
 COLORS = [
@@ -21,6 +22,7 @@ COLORS = [
 ]
 
 
+@metrics.timed("bridge.sync_asana_linear")
 def sync_asana_linear(
     asana_project_id,
     asana_access_token,
@@ -29,30 +31,76 @@ def sync_asana_linear(
     auto_create_linear_projects,
     sync_projects,
     cancel_linear_projects,
+    asana_connector: AsanaConnector = None,
+    linear_connector: LinearConnector = None,
+    id_mapping: IdMappingIndex = None,
+    write_back_to_asana: bool = False,
 ):
 
+    # the links have to survive between runs, otherwise renamed tasks get
+    # duplicated. Pass IdMappingIndex() to keep them in memory only.
+    if id_mapping is None:
+        id_mapping = IdMappingIndex(DEFAULT_ID_MAPPING_FILE)
+
+    if asana_connector is None:
+        asana_connector = AsanaConnector(access_token=asana_access_token)
+
     logger.info("Fetching data from Asana")
-    df_asana_tasks = AsanaConnector(
-        access_token=asana_access_token
-    ).get_all_tasks_for_project(asana_project_id)
+    df_asana_tasks = asana_connector.get_all_tasks_for_project(asana_project_id)
     df_asana_tasks = df_asana_tasks[df_asana_tasks.asana_linear_project]
 
     logger.info("Fetching data from Linear")
-    linear_connector = LinearConnector(access_token=linear_access_token)
+    if linear_connector is None:
+        linear_connector = LinearConnector(access_token=linear_access_token)
     team_id, _, df_linear_projects = linear_connector.get_team_and_projects(
         linear_team_name
     )
 
-    logger.info("Merging data")
-    df = df_asana_tasks.merge(
+    logger.info(
+        f"Fetched {len(df_asana_tasks)} Asana tasks and {len(df_linear_projects)} Linear projects"
+    )
+
+    report = sync_asana_linear_frames(
+        df_asana_tasks,
         df_linear_projects,
-        left_on="asana_task_name",
-        right_on="linear_project_name",
-        how="outer",
+        team_id,
+        linear_connector,
+        auto_create_linear_projects,
+        sync_projects,
+        cancel_linear_projects,
+        id_mapping=id_mapping,
+        asana_connector=asana_connector,
+        write_back_to_asana=write_back_to_asana,
     )
+
+    id_mapping.save()
+
+    return report
+
+
+def sync_asana_linear_frames(
+    df_asana_tasks: pd.DataFrame,
+    df_linear_projects: pd.DataFrame,
+    team_id: str,
+    linear_connector: LinearConnector,
+    auto_create_linear_projects,
+    sync_projects,
+    cancel_linear_projects,
+    id_mapping: IdMappingIndex = None,
+    asana_connector: AsanaConnector = None,
+    write_back_to_asana: bool = False,
+) -> t.Dict[str, int]:
+
+    if id_mapping is None:
+        id_mapping = IdMappingIndex()
+
+    report = {"created": 0, "updated": 0, "cancelled": 0}
+
+    logger.info("Merging data")
+    df = id_mapping.reconcile(df_asana_tasks, df_linear_projects, team_id=team_id)
     df["exists_on_asana"] = ~pd.isna(df.asana_task_id)
     df["exists_on_linear"] = ~pd.isna(df.linear_project_id)
-    df["ongoing"] = pd.to_datetime(df.asana_start_on) < datetime.now()
+    df["ongoing"] = df.asana_start_on < pd.Timestamp.now()
 
     df_color_mapping = pd.DataFrame(
         [
@@ -64,9 +112,10 @@ def sync_asana_linear(
 
     df = df.sort_values(by=["asana_section", "asana_start_on"]).reset_index(drop=True)
 
+    synced_project_ids = []
     for index, row in df.iterrows():
 
-        if not row.asana_linear_project:
+        if row.exists_on_asana and not row.asana_linear_project:
             continue
 
         # create linear project
@@ -75,20 +124,31 @@ def sync_asana_linear(
             and row.exists_on_asana
             and not row.exists_on_linear
         ):
+            metrics.increment("bridge.linear_projects_created")
+            report["created"] += 1
 
+            # the reconciliation already checked that the project doesn't exist
             row.linear_project_id = linear_connector.create_project(
                 name=row["asana_task_name"],
                 team_id=team_id,
+                check_existing=False,
             )
+            id_mapping.link(row.asana_task_id, row.linear_project_id, team_id)
+            synced_project_ids.append(row.linear_project_id)
 
             row.exists_on_linear = True
+            df.loc[index, ["linear_project_id", "exists_on_linear"]] = [
+                row.linear_project_id,
+                True,
+            ]
             logger.info(
                 f"Created Linear project {row.linear_project_id} for Asana task {row['asana_task_name']}"
             )
 
         # sync linear project
         if sync_projects & row.exists_on_asana & row.exists_on_linear:
-
+            metrics.increment("bridge.linear_projects_updated")
+            report["updated"] += 1
             state = "planned"
 
             if row.ongoing:
@@ -99,6 +159,7 @@ def sync_asana_linear(
 
             linear_connector.update_project(
                 project_id=row.linear_project_id,
+                name=row.asana_task_name,
                 start_date=row.asana_start_on,
                 target_date=row.asana_due_on,
                 state=state,
@@ -106,6 +167,7 @@ def sync_asana_linear(
                 color=row.linear_color,
                 sort_order=index,
             )
+            synced_project_ids.append(row.linear_project_id)
 
             logger.info(
                 f"Updated Linear project {row.linear_project_id} according to Asana task {row['asana_task_name']}"
@@ -113,10 +175,196 @@ def sync_asana_linear(
 
         # cancel linear project
         if cancel_linear_projects and not row.exists_on_asana and row.exists_on_linear:
-            if row.linear_state != "cancelled":
+            if row.linear_state != "canceled":
+                metrics.increment("bridge.linear_projects_cancelled")
+                report["cancelled"] += 1
                 linear_connector.update_project(
                     project_id=row.linear_project_id, state="canceled"
                 )
                 logger.info(
                     f"Cancelled Linear project '{row.linear_project_name}' because no asana task exists."
                 )
+
+    # the projects created or updated above are fetched again, so that their
+    # current state is written back
+    if write_back_to_asana:
+        if len(synced_project_ids) > 0:
+            df = _refresh_linear_projects(
+                df, linear_connector.get_projects(dict.fromkeys(synced_project_ids))
+            )
+        report.update(
+            write_back_linear_to_asana(
+                df, asana_connector, id_mapping=id_mapping, team_id=team_id
+            )
+        )
+
+    return report
+
+
+def _refresh_linear_projects(
+    df: pd.DataFrame, df_linear_projects: pd.DataFrame
+) -> pd.DataFrame:
+    refreshed = df.linear_project_id.isin(df_linear_projects.linear_project_id)
+    df_refreshed = (
+        df[refreshed]
+        .drop(columns=df_linear_projects.columns.drop("linear_project_id"))
+        .merge(df_linear_projects, on="linear_project_id", how="left")
+    )
+    # categories are derived again from the combined values
+    dtypes = {
+        column: "category" if isinstance(dtype, pd.CategoricalDtype) else dtype
+        for column, dtype in df.dtypes.items()
+    }
+    return pd.concat([df[~refreshed], df_refreshed], ignore_index=True).astype(dtypes)
+
+
+def _linear_custom_field_values(row) -> t.Dict[str, t.Any]:
+    progress = row.linear_progress
+    return {
+        "asana_linear_progress": (
+            None if pd.isna(progress) else int(round(float(progress) * 100))
+        ),
+        "asana_linear_state": None if pd.isna(row.linear_state) else row.linear_state,
+        "asana_linear_url": None if pd.isna(row.linear_url) else row.linear_url,
+    }
+
+
+def _differs(value, current) -> bool:
+    if pd.isna(current):
+        return True
+    # numbers are compared as such, their display depends on the precision of
+    # the Asana custom field
+    if isinstance(value, (int, float)):
+        return abs(float(current) - value) > 1e-9
+    return str(value) != str(current)
+
+
+def _write_back_changes(row, values, synced_values):
+    # the columns to write back and whether the Asana task conflicts, i.e.
+    # one of them was edited in Asana since it was last in sync with Linear
+    changed = {}
+    conflict = False
+    for column, value in values.items():
+        current = getattr(row, column)
+        if value is None or not _differs(value, current):
+            continue
+
+        if column in synced_values:
+            if not _differs(value, synced_values[column]):
+                # nothing new on Linear, an edit in Asana is kept
+                continue
+            edited_in_asana = _differs(synced_values[column], current)
+        else:
+            # never in sync before, so only the timestamps can tell
+            edited_in_asana = (
+                not pd.isna(current)
+                and not pd.isna(row.asana_modified_at)
+                and not pd.isna(row.linear_updated_at)
+                and row.asana_modified_at > row.linear_updated_at
+            )
+
+        changed[column] = value
+        conflict |= edited_in_asana
+    return changed, conflict
+
+
+@metrics.timed("bridge.write_back_linear_to_asana")
+def write_back_linear_to_asana(
+    df: pd.DataFrame,
+    asana_connector: AsanaConnector,
+    id_mapping: IdMappingIndex = None,
+    team_id: str = None,
+    force: bool = False,
+) -> t.Dict[str, int]:
+    # writes the Linear progress, state and url of every linked project into
+    # the corresponding custom fields of the Asana task. The values last
+    # known to be in sync are kept in the id mapping: if a custom field was
+    # edited in Asana since, and Linear changed as well, the update is
+    # reported as a conflict and skipped unless force is set.
+    report = {"written_back": 0, "conflicts": 0}
+    if id_mapping is None:
+        id_mapping = IdMappingIndex()
+
+    updates = {}
+    written_values = {}
+    n_without_custom_fields = 0
+    wrong_subtypes = set()
+    for row in df.itertuples():
+        if not (row.exists_on_asana and row.exists_on_linear):
+            continue
+
+        # the gids of the custom fields differ between workspaces
+        custom_fields = {}
+        for column, name in LINEAR_CUSTOM_FIELDS.items():
+            custom_field = asana_connector.get_custom_field(row.asana_task_id, name)
+            if custom_field is None:
+                continue
+            if custom_field["resource_subtype"] not in ["number", "text"]:
+                wrong_subtypes.add(name)
+                continue
+            custom_fields[column] = custom_field
+
+        if len(custom_fields) == 0:
+            n_without_custom_fields += 1
+            continue
+
+        values = {
+            column: value
+            for column, value in _linear_custom_field_values(row).items()
+            if column in custom_fields
+        }
+        id_mapping.set_synced_values(
+            row.asana_task_id,
+            team_id,
+            {
+                column: value
+                for column, value in values.items()
+                if value is not None and not _differs(value, getattr(row, column))
+            },
+        )
+
+        changed, conflict = _write_back_changes(
+            row, values, id_mapping.get_synced_values(row.asana_task_id, team_id)
+        )
+        if len(changed) == 0:
+            continue
+
+        if conflict and not force:
+            logger.warning(
+                f"Asana task {row.asana_task_name} was edited since it was last in sync with Linear project {row.linear_project_name}, skipping write back"
+            )
+            report["conflicts"] += 1
+            continue
+
+        written_values[row.asana_task_id] = changed
+        updates[row.asana_task_id] = {
+            "custom_fields": {
+                custom_fields[column]["gid"]: (
+                    value
+                    if custom_fields[column]["resource_subtype"] == "number"
+                    else str(value)
+                )
+                for column, value in changed.items()
+            }
+        }
+
+    for name in sorted(wrong_subtypes):
+        logger.warning(f"Asana custom field {name} has to be a number or text")
+    if n_without_custom_fields > 0:
+        logger.warning(
+            f"{n_without_custom_fields} Asana tasks have none of the custom fields {', '.join(LINEAR_CUSTOM_FIELDS.values())}, nothing to write back"
+        )
+
+    if len(updates) > 0:
+        status_codes = asana_connector.batch_update_tasks(updates)
+        for asana_task_id, status_code in status_codes.items():
+            if status_code < 400:
+                report["written_back"] += 1
+                id_mapping.set_synced_values(
+                    asana_task_id, team_id, written_values[asana_task_id]
+                )
+        logger.info(
+            f"Wrote back {report['written_back']} Linear projects to Asana in {len(updates)} updates"
+        )
+
+    return report
@@ -0,0 +1,258 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+import typing as t
+from wsgiref.simple_server import make_server
+
+import asana
+import pandas as pd
+from loguru import logger
+
+from asananas.allocation_management import AllocationModel
+from asananas.asana_connector import TASK_COLUMNS, AsanaConnector
+from asananas.instrumentation import metrics
+from asananas.schema import apply_asana_task_schema
+
+DEFAULT_SECRET_DIR = os.path.join(os.path.expanduser("~"), ".asananas")
+
+
+def default_secret_file(project_id: str) -> str:
+    return os.path.join(DEFAULT_SECRET_DIR, f"webhook_secret_{project_id}")
+
+
+class AsanaWebhookReceiver:
+    """Small WSGI app applying Asana webhook events to a cached task frame.
+
+    Instead of re-fetching the whole project, every event only re-fetches the
+    affected task and replaces its contribution in the `AllocationModel`.
+    The person-weeks touched since the last call to
+    `pop_invalidated_person_weeks` are tracked so that consumers can refresh
+    only those.
+
+    Asana sends the secret for signing events only once, during the
+    handshake. If `secret_file` is given, the secret is stored there and
+    read again on the next start, otherwise all events after a restart are
+    rejected.
+    """
+
+    def __init__(
+        self,
+        asana_connector: AsanaConnector,
+        project_id: str,
+        df_asana_tasks: pd.DataFrame = None,
+        n_workdays_per_week: int = 5,
+        secret: str = None,
+        on_update: t.Callable[[t.Set[t.Tuple[str, str]]], None] = None,
+        secret_file: str = None,
+    ) -> None:
+
+        self.asana_connector = asana_connector
+        self.project_id = project_id
+        self.n_workdays_per_week = n_workdays_per_week
+        self.secret_file = secret_file
+        self.secret = secret if secret is not None else self._load_secret()
+        self.on_update = on_update
+
+        self._lock = threading.Lock()
+        self._invalidated_person_weeks = set()
+
+        if df_asana_tasks is None:
+            df_asana_tasks = asana_connector.iter_task_batches(project_id)
+
+        self.allocation_model = AllocationModel.from_asana_tasks(
+            df_asana_tasks, n_workdays_per_week=n_workdays_per_week
+        )
+
+    # cached data
+    # ###########
+
+    @property
+    def df_asana_tasks(self) -> pd.DataFrame:
+        with self._lock:
+            if len(self.allocation_model) == 0:
+                return pd.DataFrame(columns=TASK_COLUMNS)
+            return apply_asana_task_schema(pd.DataFrame(self.allocation_model.tasks))
+
+    @property
+    def df_allocation_data(self) -> pd.DataFrame:
+        with self._lock:
+            return self.allocation_model.df_allocation_data
+
+    @property
+    def weekly_allocation(self) -> t.Dict[t.Tuple[str, str], float]:
+        with self._lock:
+            return self.allocation_model.weekly_allocation
+
+    def pop_invalidated_person_weeks(self) -> t.Set[t.Tuple[str, str]]:
+        with self._lock:
+            person_weeks = self._invalidated_person_weeks
+            self._invalidated_person_weeks = set()
+        return person_weeks
+
+    # secret
+    # ######
+
+    def _load_secret(self):
+        if self.secret_file is None or not os.path.exists(self.secret_file):
+            return None
+        with open(self.secret_file, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+
+    def _save_secret(self):
+        if self.secret_file is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.secret_file)), exist_ok=True)
+        tmp_file_path = self.secret_file + ".tmp"
+        with open(
+            os.open(tmp_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600),
+            "w",
+            encoding="utf-8",
+        ) as f:
+            f.write(self.secret)
+        os.replace(tmp_file_path, self.secret_file)
+
+    # event handling
+    # ##############
+
+    def _affected_task_ids(self, events):
+        task_ids = {}
+        for event in events:
+            resource = event.get("resource") or {}
+            parent = event.get("parent") or {}
+
+            if resource.get("resource_type") == "task":
+                task_id = resource["gid"]
+                removed = event.get("action") == "deleted" or (
+                    event.get("action") == "removed"
+                    and parent.get("gid") == self.project_id
+                )
+            elif parent.get("resource_type") == "task":
+                # e.g. stories or attachments added to a task
+                task_id = parent["gid"]
+                removed = False
+            else:
+                continue
+
+            # the last event for a task wins
+            task_ids[task_id] = removed
+
+        return task_ids
+
+    def apply_events(self, events: t.List[t.Dict]) -> t.Set[t.Tuple[str, str]]:
+        person_weeks = set()
+
+        for task_id, removed in self._affected_task_ids(events).items():
+            task = None
+            if not removed:
+                # a single broken task must not fail the whole batch, Asana
+                # would retry it again and again and finally drop the webhook
+                try:
+                    task = self.asana_connector.get_task(task_id, self.project_id)
+                except (asana.error.NotFoundError, asana.error.ForbiddenError):
+                    logger.info(f"Asana task {task_id} is gone, removing it")
+                except Exception as e:
+                    logger.error(f"Fetching Asana task {task_id} failed: {e}")
+                    metrics.increment("webhook.failed_tasks")
+                    continue
+
+            with self._lock:
+                if task is None:
+                    person_weeks |= self.allocation_model.remove_task(task_id)
+                else:
+                    person_weeks |= self.allocation_model.replace_task(task)
+
+        with self._lock:
+            self._invalidated_person_weeks |= person_weeks
+
+        if len(person_weeks) > 0:
+            logger.info(
+                f"Applied {len(events)} Asana events, {len(person_weeks)} person-weeks invalidated"
+            )
+            if self.on_update is not None:
+                self.on_update(person_weeks)
+
+        return person_weeks
+
+    # http
+    # ####
+
+    def _is_valid_signature(self, body, signature):
+        if self.secret is None or signature is None:
+            return False
+        expected = hmac.new(
+            self.secret.encode("utf-8"), body, hashlib.sha256
+        ).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    def handle_request(
+        self, headers: t.Dict[str, str], body: bytes
+    ) -> t.Tuple[int, t.Dict[str, str]]:
+        headers = {k.lower(): v for k, v in headers.items()}
+
+        # handshake
+        if "x-hook-secret" in headers:
+            if self.secret is not None and self.secret != headers["x-hook-secret"]:
+                logger.warning("Rejected Asana webhook handshake, secret mismatch")
+                return 403, {}
+            self.secret = headers["x-hook-secret"]
+            self._save_secret()
+            logger.info("Asana webhook handshake completed")
+            return 200, {"X-Hook-Secret": self.secret}
+
+        # events
+        if not self._is_valid_signature(body, headers.get("x-hook-signature")):
+            logger.warning("Rejected Asana webhook event, invalid signature")
+            return 401, {}
+
+        try:
+            events = json.loads(body or b"{}").get("events", [])
+        except ValueError:
+            return 400, {}
+
+        self.apply_events(events)
+        return 200, {}
+
+    def __call__(self, environ, start_response):
+        if environ["REQUEST_METHOD"] != "POST":
+            start_response("405 Method Not Allowed", [])
+            return [b""]
+
+        headers = {
+            k[5:].replace("_", "-"): v
+            for k, v in environ.items()
+            if k.startswith("HTTP_")
+        }
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length)
+
+        status, response_headers = self.handle_request(headers, body)
+
+        reasons = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden"}
+        start_response(f"{status} {reasons[status]}", list(response_headers.items()))
+        return [b""]
+
+
+def serve(receiver: AsanaWebhookReceiver, host: str = "0.0.0.0", port: int = 8090):
+    with make_server(host, port, receiver) as httpd:
+        logger.info(f"Listening for Asana webhook events on {host}:{port}")
+        httpd.serve_forever()
+
+
+def run():
+    # the webhook itself has to be registered once the receiver is reachable,
+    # e.g. via AsanaConnector().create_webhook(project_id, public_url)
+    project_id = os.getenv("ASANA_PROJECT_ID")
+    if project_id is None:
+        raise Exception("No Asana project id provided")
+
+    receiver = AsanaWebhookReceiver(
+        AsanaConnector(),
+        project_id,
+        secret=os.getenv("ASANA_WEBHOOK_SECRET"),
+        secret_file=os.getenv(
+            "ASANA_WEBHOOK_SECRET_FILE", default_secret_file(project_id)
+        ),
+    )
+    serve(receiver, port=int(os.getenv("ASANA_WEBHOOK_PORT", 8090)))
@@ -1,3 +1,4 @@
+import datetime
 import os
 
 import streamlit as st
@@ -8,10 +9,13 @@ try:
     from asananas import __version__ as VERSION
     from asananas.allocation_management import (
         extract_allocation_data,
-        visualize_allocation_by_week,
     )
     from asananas.asana_connector import AsanaConnector
     from asananas.asana_linear_bridge import sync_asana_linear
+    from asananas.figure_cache import cached_visualize_allocation_by_week, figure_cache
+    from asananas.id_mapping import DEFAULT_ID_MAPPING_FILE, IdMappingIndex
+    from asananas.instrumentation import metrics
+    from asananas.load_index import LoadIndex
 
     ASANANAS_DEMO_MODE = False
     LAYOUT = "centered"
@@ -109,6 +113,11 @@ def _load_data(asana_access_token, asana_project_id):
     )
 
 
+@st.experimental_memo(ttl=3600)
+def _build_load_index(df_allocation_data):
+    return LoadIndex(df_allocation_data, n_workdays_per_week=5)
+
+
 # Header and Credentials
 # ######################
 
@@ -242,6 +251,7 @@ else:
         _get_workspaces.clear()
         _get_projects.clear()
         _load_data.clear()
+        _build_load_index.clear()
         st.experimental_rerun()
 
     (
@@ -278,9 +288,30 @@ else:
         ]
 
         # visualize
-        fig = visualize_allocation_by_week(df_allocation_data_plot)
+        fig = cached_visualize_allocation_by_week(df_allocation_data_plot)
         st.plotly_chart(fig, theme=None)
 
+        # find available people
+        with st.expander("Find available people", expanded=False):
+            load_index = _build_load_index(df_allocation_data)
+            today = datetime.date.today()
+            c1, c2 = st.columns(2)
+            with c1:
+                start = st.date_input("From", value=today)
+            with c2:
+                end = st.date_input("To", value=today + datetime.timedelta(weeks=4))
+            fraction = st.slider("Required free capacity (%)", 10, 100, 50, 10)
+            strict = st.checkbox(
+                "Required on every single day (instead of on average)", value=False
+            )
+            df_available = load_index.available_people(
+                start, end, fraction=fraction / 100, strict=strict
+            )
+            if len(df_available) == 0:
+                st.info("Nobody has enough free capacity in this period.")
+            else:
+                st.dataframe(df_available, use_container_width=True)
+
     # warnings and errors
     if len(projects_with_no_allocation) > 0:
         st.warning(
@@ -306,6 +337,10 @@ with c2:
     sync_projects = st.checkbox("Sync project timelines", value=True)
 with c3:
     cancel_linear_projects = st.checkbox("Auto cancel Linear projects", value=True)
+write_back_to_asana = st.checkbox(
+    "Write Linear progress, state and URL back to the Asana custom fields 'Linear Progress', 'Linear State' and 'Linear URL'",
+    value=False,
+)
 
 if ASANANAS_DEMO_MODE:
     st.warning("Linear Bridge is disabled in demo mode.")
@@ -327,8 +362,28 @@ else:
                     auto_create_linear_projects,
                     sync_projects,
                     cancel_linear_projects,
+                    id_mapping=IdMappingIndex(DEFAULT_ID_MAPPING_FILE),
+                    write_back_to_asana=write_back_to_asana,
                 )
     else:
         st.warning(
             "Make sure you provided the linear access token, linear team name and linear access token in the settings above."
         )
+
+
+# Instrumentation
+# ###############
+
+if not ASANANAS_DEMO_MODE:
+    with st.sidebar.expander("Performance", expanded=False):
+        st.markdown(
+            "Timings, request counts and transferred bytes since the dashboard was started."
+        )
+        st.dataframe(metrics.summary(), use_container_width=True)
+        st.markdown(
+            f"Figure cache hit rate: {figure_cache.hit_rate:.0%} ({figure_cache.stats})"
+        )
+        if st.button("Reset Metrics"):
+            metrics.reset()
+            figure_cache.reset_stats()
+            st.experimental_rerun()
@@ -0,0 +1,214 @@
+import hashlib
+import inspect
+import json
+import os
+import threading
+import typing as t
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+from asananas._version import __version__
+from asananas.allocation_management import visualize_allocation_by_week
+from asananas.instrumentation import metrics
+
+# the only columns of the allocation data that end up in the figure
+ALLOCATION_COLUMNS = ["date", "name", "allocation", "project"]
+
+_code_hashes = {}
+
+
+def _code_hash(build: t.Callable) -> str:
+    # cached figures of an older version of the build function are stale, e.g.
+    # in the on-disk cache after an upgrade
+    if build not in _code_hashes:
+        function = inspect.unwrap(build)
+        try:
+            code = inspect.getsource(function).encode("utf-8")
+        except (OSError, TypeError):
+            code = function.__code__.co_code
+        _code_hashes[build] = hashlib.blake2b(code, digest_size=16).hexdigest()
+    return _code_hashes[build]
+
+
+class FigureCache:
+    """Content-addressed cache of serialized Plotly figures.
+
+    Entries are keyed by a hash of the input frame, the parameters, the code
+    of the build function and the asananas and plotly versions and are kept
+    in a LRU in memory. If `cache_dir` is given, entries are written to
+    disk as well, so that they survive restarts and are shared between the
+    dashboard and scripts. The disk holds at most `max_entries` as well,
+    the least recently used files are removed first.
+    """
+
+    def __init__(self, max_entries: int = 32, cache_dir: str = None) -> None:
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    @property
+    def hit_rate(self) -> float:
+        n_hits = self.stats["hits"] + self.stats["disk_hits"]
+        n_requests = n_hits + self.stats["misses"]
+        return 0.0 if n_requests == 0 else n_hits / n_requests
+
+    def make_key(self, df: pd.DataFrame, **params) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps(list(map(str, df.columns))).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> t.Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                metrics.increment("figure_cache.hits")
+                return self._entries[key]
+
+        value = self._read_from_disk(key)
+        if value is not None:
+            self._put_in_memory(key, value)
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            metrics.increment("figure_cache.disk_hits")
+            return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        metrics.increment("figure_cache.misses")
+        return None
+
+    def _read_from_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                value = f.read()
+            # the modification time orders the files by their last use
+            os.utime(self._disk_path(key))
+        except FileNotFoundError:
+            # e.g. removed by another process in the meantime
+            return None
+        return value
+
+    def _evict_from_disk(self):
+        paths = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if not name.endswith(".tmp")
+        ]
+        if len(paths) <= self.max_entries:
+            return
+
+        def _mtime(path):
+            try:
+                return os.path.getmtime(path)
+            except FileNotFoundError:
+                return 0.0
+
+        for path in sorted(paths, key=_mtime)[: len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _put_in_memory(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key: str, value: str) -> None:
+        self._put_in_memory(key, value)
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self._disk_path(key) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, self._disk_path(key))
+            self._evict_from_disk()
+
+    def clear(self) -> None:
+        # the entries in memory only, see also reset_stats
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def _get_or_build(self, kind, df, build, params):
+        key = self.make_key(
+            df,
+            kind=kind,
+            build=build.__name__,
+            build_code=_code_hash(build),
+            asananas_version=__version__,
+            plotly_version=plotly.__version__,
+            **params,
+        )
+        value = self.get(key)
+        if value is None:
+            fig = build(df.copy(), **params)
+            value = fig.to_json() if kind == "json" else fig.to_html()
+            self.put(key, value)
+        return value
+
+    def get_figure(self, df: pd.DataFrame, build: t.Callable, **params):
+        return pio.from_json(self._get_or_build("json", df, build, params))
+
+    def get_html(self, df: pd.DataFrame, build: t.Callable, **params) -> str:
+        return self._get_or_build("html", df, build, params)
+
+
+def _allocation_figure_params(n_workdays_per_week, current_date):
+    # the figure depends on the current week, so "now" is part of the key
+    if current_date is None:
+        current_date = datetime.now().strftime("%Y-%m-%d")
+    return {"n_workdays_per_week": n_workdays_per_week, "current_date": current_date}
+
+
+def cached_visualize_allocation_by_week(
+    df_allocation_data: pd.DataFrame,
+    n_workdays_per_week: int = 5,
+    current_date: str = None,
+    cache: FigureCache = None,
+):
+    cache = cache if cache is not None else figure_cache
+    return cache.get_figure(
+        df_allocation_data[ALLOCATION_COLUMNS],
+        visualize_allocation_by_week,
+        **_allocation_figure_params(n_workdays_per_week, current_date),
+    )
+
+
+def cached_allocation_html(
+    df_allocation_data: pd.DataFrame,
+    n_workdays_per_week: int = 5,
+    current_date: str = None,
+    cache: FigureCache = None,
+) -> str:
+    cache = cache if cache is not None else figure_cache
+    return cache.get_html(
+        df_allocation_data[ALLOCATION_COLUMNS],
+        visualize_allocation_by_week,
+        **_allocation_figure_params(n_workdays_per_week, current_date),
+    )
+
+
+# process wide default cache used by the dashboard
+figure_cache = FigureCache()
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+import threading
+import typing as t
+
+import pandas as pd
+from loguru import logger
+
+DEFAULT_ID_MAPPING_FILE = os.path.join(
+    os.path.expanduser("~"), ".asananas", "id_mapping.json"
+)
+
+
+def normalize_name(name: str) -> str:
+    # case, punctuation and whitespace insensitive
+    if not isinstance(name, str):
+        return ""
+    return " ".join(re.sub(r"[^\w\s]", " ", name.casefold()).split())
+
+
+class IdMappingIndex:
+    """Persistent mapping between Asana task gids and Linear project ids.
+
+    The mapping is the primary join key when reconciling Asana tasks with
+    Linear projects, so that renaming a task does not break the link.
+    Normalized names are only used as a fallback for unlinked entries. Links
+    are kept per Linear team, as one Asana project may be synced to several
+    teams. Next to every link, the custom field values last known to be in
+    sync between both sides are kept, see `write_back_linear_to_asana`.
+    Pass `file_path=None` to keep the mapping in memory only.
+    """
+
+    def __init__(self, file_path: str = None) -> None:
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._asana_to_linear = {}
+        self._linear_to_asana = {}
+        self._synced_values = {}
+
+        if file_path is not None and os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf-8") as f:
+                for team_id, links in json.load(f).items():
+                    for asana_task_id, entry in links.items():
+                        self.link(asana_task_id, entry["linear_project_id"], team_id)
+                        self.set_synced_values(
+                            asana_task_id, team_id, entry.get("synced_values", {})
+                        )
+
+    def __len__(self):
+        return len(self._asana_to_linear)
+
+    def link(self, asana_task_id: str, linear_project_id: str, team_id: str) -> None:
+        with self._lock:
+            if self._asana_to_linear.get((team_id, asana_task_id)) == linear_project_id:
+                return
+            self._unlink((team_id, asana_task_id))
+            self._unlink(self._linear_to_asana.get(linear_project_id))
+            self._asana_to_linear[(team_id, asana_task_id)] = linear_project_id
+            self._linear_to_asana[linear_project_id] = (team_id, asana_task_id)
+
+    def _unlink(self, key):
+        linear_project_id = self._asana_to_linear.pop(key, None)
+        self._linear_to_asana.pop(linear_project_id, None)
+        self._synced_values.pop(key, None)
+
+    def unlink(self, asana_task_id: str, team_id: str) -> None:
+        with self._lock:
+            self._unlink((team_id, asana_task_id))
+
+    def get_linear_project_id(
+        self, asana_task_id: str, team_id: str
+    ) -> t.Optional[str]:
+        return self._asana_to_linear.get((team_id, asana_task_id))
+
+    def get_asana_task_id(self, linear_project_id: str) -> t.Optional[str]:
+        return self._linear_to_asana.get(linear_project_id, (None, None))[1]
+
+    def get_synced_values(self, asana_task_id: str, team_id: str) -> t.Dict:
+        return dict(self._synced_values.get((team_id, asana_task_id), {}))
+
+    def set_synced_values(
+        self, asana_task_id: str, team_id: str, values: t.Dict
+    ) -> None:
+        # only for linked tasks, values of other columns are kept
+        with self._lock:
+            if (team_id, asana_task_id) in self._asana_to_linear:
+                self._synced_values.setdefault((team_id, asana_task_id), {}).update(
+                    values
+                )
+
+    def save(self) -> None:
+        if self.file_path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+        data = {}
+        with self._lock:
+            for (team_id, asana_task_id), linear_project_id in sorted(
+                self._asana_to_linear.items(), key=lambda item: str(item[0])
+            ):
+                entry = {"linear_project_id": linear_project_id}
+                synced_values = self._synced_values.get((team_id, asana_task_id))
+                if synced_values:
+                    entry["synced_values"] = synced_values
+                data.setdefault(team_id, {})[asana_task_id] = entry
+        tmp_file_path = self.file_path + ".tmp"
+        with open(tmp_file_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_file_path, self.file_path)
+
+    def reconcile(
+        self,
+        df_asana_tasks: pd.DataFrame,
+        df_linear_projects: pd.DataFrame,
+        team_id: str,
+    ) -> pd.DataFrame:
+        # equivalent of an outer merge of both frames, joined by the id
+        # mapping of the team first and by normalized names second
+        linear_projects = df_linear_projects.to_dict("records")
+        linear_by_id = {p["linear_project_id"]: p for p in linear_projects}
+
+        linear_by_name = {}
+        for p in linear_projects:
+            linked_asana_task_id = self.get_asana_task_id(p["linear_project_id"])
+            if linked_asana_task_id is None:
+                linear_by_name.setdefault(normalize_name(p["linear_project_name"]), p)
+
+        empty_linear = {c: None for c in df_linear_projects.columns}
+        empty_asana = {c: None for c in df_asana_tasks.columns}
+
+        rows = []
+        matched = set()
+        n_matched_by_name = 0
+        for task in df_asana_tasks.to_dict("records"):
+            project = linear_by_id.get(
+                self.get_linear_project_id(task["asana_task_id"], team_id)
+            )
+
+            if project is None:
+                project = linear_by_name.get(normalize_name(task["asana_task_name"]))
+                if project is not None and project["linear_project_id"] in matched:
+                    project = None
+                if project is not None:
+                    n_matched_by_name += 1
+                    self.link(
+                        task["asana_task_id"], project["linear_project_id"], team_id
+                    )
+
+            if project is None:
+                rows.append({**task, **empty_linear})
+            else:
+                matched.add(project["linear_project_id"])
+                rows.append({**task, **project})
+
+        for project in linear_projects:
+            if project["linear_project_id"] not in matched:
+                rows.append({**empty_asana, **project})
+
+        if n_matched_by_name > 0:
+            logger.info(f"Linked {n_matched_by_name} Linear projects by name")
+
+        # keep the dtypes of both frames, see asananas.schema
+        dtypes = {
+            **df_linear_projects.dtypes.to_dict(),
+            **df_asana_tasks.dtypes.to_dict(),
+        }
+        df = pd.DataFrame(rows, columns=list(dtypes))
+        for column, dtype in dtypes.items():
+            if isinstance(dtype, pd.DatetimeTZDtype):
+                # columns without any timestamp come back timezone-naive
+                df[column] = pd.to_datetime(df[column], utc=True)
+        return df.astype(dtypes)
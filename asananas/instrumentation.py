@@ -0,0 +1,207 @@
+import functools
+import json
+import os
+import threading
+import time
+import typing as t
+from contextlib import contextmanager
+
+import pandas as pd
+from loguru import logger
+
+
+class JsonLogSink:
+    """Writes every metric record as one JSON line via loguru."""
+
+    def __init__(self, level: str = "DEBUG") -> None:
+        self.level = level
+
+    def emit(self, record: t.Dict) -> None:
+        logger.log(self.level, json.dumps(record, default=str))
+
+
+class SpanSink:
+    """Collects timings as OpenTelemetry-style span dicts."""
+
+    def __init__(self, max_spans: int = 10000) -> None:
+        self.max_spans = max_spans
+        self.spans = []
+
+    def emit(self, record: t.Dict) -> None:
+        if record["type"] != "span":
+            return
+        self.spans.append(
+            {
+                "name": record["name"],
+                "trace_id": record["trace_id"],
+                "span_id": record["span_id"],
+                "parent_span_id": record["parent_span_id"],
+                "start_time_unix_nano": record["start_time_unix_nano"],
+                "end_time_unix_nano": record["end_time_unix_nano"],
+                "status": record["status"],
+                "attributes": record["attributes"],
+            }
+        )
+        del self.spans[: -self.max_spans]
+
+
+class PrometheusSink:
+    """Renders the current state of a registry in Prometheus text format."""
+
+    def __init__(self, registry: "MetricsRegistry" = None, prefix: str = "asananas"):
+        self.registry = registry
+        self.prefix = prefix
+
+    def emit(self, record: t.Dict) -> None:
+        pass
+
+    def _name(self, name):
+        return f"{self.prefix}_{name}".replace(".", "_").replace("-", "_")
+
+    def render(self) -> str:
+        registry = self.registry if self.registry is not None else metrics
+        counters, timings = registry.snapshot()
+
+        lines = []
+        for name, value in sorted(counters.items()):
+            n = self._name(name) + "_total"
+            lines.append(f"# TYPE {n} counter")
+            lines.append(f"{n} {value}")
+        for name, timing in sorted(timings.items()):
+            n = self._name(name) + "_seconds"
+            lines.append(f"# TYPE {n} summary")
+            lines.append(f"{n}_count {timing['count']}")
+            lines.append(f"{n}_sum {timing['total']}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """Thread-safe in-process counters and timings with pluggable sinks."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {}
+        self._timings = {}
+        self.sinks = []
+
+    def add_sink(self, sink) -> None:
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink) -> None:
+        self.sinks.remove(sink)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = {}
+            self._timings = {}
+
+    def _emit(self, record):
+        for sink in list(self.sinks):
+            sink.emit(record)
+
+    def increment(self, name: str, value: float = 1, **attributes) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        if self.sinks:
+            self._emit({"type": "counter", "name": name, "value": value, **attributes})
+
+    def record_timing(self, name: str, seconds: float) -> None:
+        with self._lock:
+            timing = self._timings.setdefault(
+                name, {"count": 0, "total": 0.0, "max": 0.0}
+            )
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+
+    @contextmanager
+    def timer(self, name: str, **attributes):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        span_id = os.urandom(8).hex()
+        trace_id = stack[0][0] if stack else os.urandom(16).hex()
+        parent_span_id = stack[-1][1] if stack else None
+
+        stack.append((trace_id, span_id))
+        start_ns = time.time_ns()
+        t0 = time.perf_counter()
+        status = "ok"
+        try:
+            yield attributes
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - t0
+            stack.pop()
+            self.record_timing(name, seconds)
+            if self.sinks:
+                self._emit(
+                    {
+                        "type": "span",
+                        "name": name,
+                        "seconds": seconds,
+                        "trace_id": trace_id,
+                        "span_id": span_id,
+                        "parent_span_id": parent_span_id,
+                        "start_time_unix_nano": start_ns,
+                        "end_time_unix_nano": start_ns + int(seconds * 1e9),
+                        "status": status,
+                        "attributes": attributes,
+                    }
+                )
+
+    def timed(self, name: str):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self) -> t.Tuple[t.Dict[str, float], t.Dict[str, t.Dict]]:
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {k: dict(v) for k, v in self._timings.items()}
+        return counters, timings
+
+    def summary(self) -> pd.DataFrame:
+        counters, timings = self.snapshot()
+        data = [
+            {"metric": name, "count": value, "total_s": None, "max_s": None}
+            for name, value in counters.items()
+        ] + [
+            {
+                "metric": name,
+                "count": timing["count"],
+                "total_s": round(timing["total"], 3),
+                "max_s": round(timing["max"], 3),
+            }
+            for name, timing in timings.items()
+        ]
+        return pd.DataFrame(
+            data, columns=["metric", "count", "total_s", "max_s"]
+        ).sort_values("metric")
+
+
+def count_http_response(prefix, response, retried=False, registry=None):
+    registry = registry if registry is not None else metrics
+    registry.increment(f"{prefix}.requests")
+    registry.increment(f"{prefix}.bytes_received", len(response.content or b""))
+    body = response.request.body if response.request is not None else None
+    registry.increment(f"{prefix}.bytes_sent", len(body or b""))
+    registry.record_timing(f"{prefix}.request", response.elapsed.total_seconds())
+    if response.status_code == 429 or response.status_code >= 500:
+        registry.increment(f"{prefix}.retries" if retried else f"{prefix}.errors")
+    elif response.status_code >= 400:
+        registry.increment(f"{prefix}.errors")
+
+
+# process wide default registry used by the connectors and the pipeline
+metrics = MetricsRegistry()
@@ -0,0 +1,235 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from asananas.instrumentation import metrics
+from asananas.scenarios import ScenarioEngine, Shift
+
+TOLERANCE = 1e-9
+
+
+def _shifted_load(segments, local_person, n_local, shifts, offset, width):
+    # load of one task on its window for every candidate shift, shape
+    # (shifts, people of the task, workdays of the window)
+    n_shifts = len(shifts)
+    start = segments["start"][None, :] + shifts[:, None] - offset
+    end = segments["end"][None, :] + shifts[:, None] - offset
+    row = (np.arange(n_shifts)[:, None] * n_local + local_person[None, :]) * (width + 1)
+    value = np.broadcast_to(segments["value"], start.shape)
+
+    diff = np.bincount(
+        np.concatenate([(row + start).ravel(), (row + end).ravel()]),
+        weights=np.concatenate([value.ravel(), -value.ravel()]),
+        minlength=n_shifts * n_local * (width + 1),
+    )
+    diff = diff.reshape(n_shifts, n_local, width + 1)
+    return np.cumsum(diff, axis=2)[:, :, :width]
+
+
+def _utilization_summary(names, load_before, load_after, capacity, n_workdays_per_week):
+    data = {"name": names}
+    for label, load in [("before", load_before), ("after", load_after)]:
+        excess = np.clip(load - capacity, 0, None)
+        data[f"peak_allocation_{label}"] = load.max(axis=1, initial=0)
+        data[f"over_allocated_days_{label}"] = (excess > TOLERANCE).sum(axis=1)
+        data[f"excess_person_weeks_{label}"] = excess.sum(axis=1) / n_workdays_per_week
+    return pd.DataFrame(data)
+
+
+@metrics.timed("leveling.level_allocations")
+def level_allocations(
+    df_allocation_data,
+    slack_weeks=4,
+    allow_delays=False,
+    current_date=None,
+    n_workdays_per_week=5,
+    capacity=1.0,
+    max_passes=10,
+):
+    """Propose start date shifts which level the load of over-allocated people.
+
+    Tasks (i.e. projects of the allocation data) are shifted by at most
+    `slack_weeks`. Tasks which already started are not moved and no task is
+    moved into the past. Unless `allow_delays` is set, tasks are only moved
+    to earlier dates, so that no task ends after its due date.
+
+    The heuristic repeatedly picks every task which contributes to an
+    over-allocation and moves it to the shift which minimizes first the peak
+    over-allocation and second the total over-allocation of the team. Only
+    the people and workdays of the task are re-evaluated for every candidate
+    shift, so that thousands of tasks are leveled within seconds.
+
+    Returns the suggested moves and a before/after utilization summary by
+    person from `current_date` on.
+    """
+
+    if current_date is None:
+        t = datetime.now()
+    else:
+        t = datetime.strptime(current_date, "%Y-%m-%d")
+
+    engine = ScenarioEngine(
+        df_allocation_data,
+        n_workdays_per_week=n_workdays_per_week,
+        padding_weeks=slack_weeks + 1,
+    )
+    segments = engine._segments
+    n_days = len(engine.dates)
+    slack = slack_weeks * n_workdays_per_week
+    today = engine.dates.searchsorted(pd.Timestamp(t).normalize())
+
+    # the past cannot be changed anymore, so only the future is leveled
+    load_before = engine.load_matrix()
+    load = load_before.copy()
+    excess = np.clip(load - capacity, 0, None)
+    excess[:, :today] = 0
+    row_peak = excess.max(axis=1, initial=0)
+    total_excess = excess.sum()
+
+    # movable tasks and their range of shifts
+    tasks = []
+    order = np.argsort(segments["project"], kind="stable")
+    for idx in np.split(order, np.flatnonzero(np.diff(segments["project"][order])) + 1):
+        task_segments = {k: v[idx] for k, v in segments.items()}
+        start = task_segments["start"].min()
+        end = task_segments["end"].max()
+        if start < today:
+            continue
+
+        lo = max(-slack, today - start, -start)
+        hi = min(slack if allow_delays else 0, n_days - end)
+        if lo == hi:
+            continue
+
+        people, local_person = np.unique(task_segments["person"], return_inverse=True)
+        tasks.append(
+            {
+                "project": task_segments["project"][0],
+                "segments": task_segments,
+                "people": people,
+                "local_person": local_person,
+                "shifts": np.arange(lo, hi + 1),
+                "offset": start + lo,
+                "width": end + hi - (start + lo),
+                "shift": 0,
+            }
+        )
+
+    n_moves = 0
+    for n_pass in range(max_passes):
+
+        # only tasks which overlap an over-allocation can improve anything
+        candidates = []
+        for task in tasks:
+            s = task["shift"]
+            t0 = task["segments"]["start"].min() + s
+            t1 = task["segments"]["end"].max() + s
+            task_excess = excess[task["people"], t0:t1].sum()
+            if task_excess > TOLERANCE:
+                candidates.append((task_excess, id(task), task))
+
+        improved = False
+        for _, _, task in sorted(candidates, key=lambda c: c[:2], reverse=True):
+
+            people = task["people"]
+            w0 = task["offset"]
+            w1 = task["offset"] + task["width"]
+            contributions = _shifted_load(
+                task["segments"],
+                task["local_person"],
+                len(people),
+                task["shifts"],
+                task["offset"],
+                task["width"],
+            )
+            current = contributions[task["shift"] - task["shifts"][0]]
+
+            # load of everybody else on the window of the task
+            load_without = load[people, w0:w1] - current
+            window_excess = np.clip(
+                load_without[None] + contributions - capacity, 0, None
+            )
+
+            # peak over-allocation everywhere except on the window of the task
+            other_rows = np.delete(row_peak, people)
+            outside = [excess[people, :w0], excess[people, w1:], other_rows]
+            peak_outside = max([x.max(initial=0) for x in outside])
+
+            peak = np.maximum(window_excess.max(axis=(1, 2)), peak_outside)
+            total = (
+                total_excess
+                - excess[people, w0:w1].sum()
+                + window_excess.sum(axis=(1, 2))
+            )
+
+            i_current = task["shift"] - task["shifts"][0]
+            i_best = np.lexsort((np.abs(task["shifts"]), total, np.round(peak, 9)))[0]
+            is_better = peak[i_best] < peak[i_current] - TOLERANCE or (
+                peak[i_best] <= peak[i_current] + TOLERANCE
+                and total[i_best] < total[i_current] - TOLERANCE
+            )
+            if not is_better:
+                continue
+
+            # apply move
+            load[people, w0:w1] = load_without + contributions[i_best]
+            excess[people, w0:w1] = window_excess[i_best]
+            row_peak[people] = excess[people].max(axis=1, initial=0)
+            total_excess = total[i_best]
+            task["shift"] = int(task["shifts"][i_best])
+            n_moves += 1
+            improved = True
+
+        logger.info(
+            f"Leveling pass {n_pass + 1}: peak over-allocation {row_peak.max(initial=0):.2f}, "
+            f"excess {total_excess / n_workdays_per_week:.2f} person-weeks"
+        )
+        if not improved:
+            break
+
+    metrics.increment("leveling.moves", n_moves)
+
+    moves = []
+    for task in tasks:
+        if task["shift"] == 0:
+            continue
+        start = task["segments"]["start"].min()
+        end = task["segments"]["end"].max()
+        moves.append(
+            {
+                "project": engine.projects[task["project"]],
+                "n_workdays": task["shift"],
+                "start_before": engine.dates[start],
+                "start_after": engine.dates[start + task["shift"]],
+                "due_before": engine.dates[end - 1],
+                "due_after": engine.dates[end - 1 + task["shift"]],
+            }
+        )
+    df_moves = pd.DataFrame(
+        moves,
+        columns=[
+            "project",
+            "n_workdays",
+            "start_before",
+            "start_after",
+            "due_before",
+            "due_after",
+        ],
+    )
+
+    df_summary = _utilization_summary(
+        engine.names,
+        load_before[:, today:],
+        load[:, today:],
+        capacity,
+        n_workdays_per_week,
+    )
+
+    return df_moves, df_summary
+
+
+def moves_to_edits(df_moves):
+    # the suggested moves as edits for asananas.scenarios.ScenarioEngine
+    return [Shift(row.project, row.n_workdays) for row in df_moves.itertuples()]
@@ -1,17 +1,39 @@
 import os
+import time
 import typing as t
-from datetime import datetime
+from datetime import date, datetime
 
 import pandas as pd
 import requests
 from loguru import logger
 
+from asananas.instrumentation import count_http_response, metrics
+from asananas.schema import apply_linear_project_schema, parse_date
+
+PROJECT_COLUMNS = [
+    "linear_project_id",
+    "linear_project_name",
+    "linear_start_date",
+    "linear_target_date",
+    "linear_state",
+    "linear_url",
+    "linear_progress",
+    "linear_updated_at",
+]
+
 
 class LinearConnector:
 
     url = "https://api.linear.app/graphql"
 
-    def __init__(self, access_token: str = None) -> None:
+    def __init__(
+        self,
+        access_token: str = None,
+        url: str = None,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        rate_limiter=None,
+    ) -> None:
 
         if access_token is None:
             access_token = os.getenv("LINEAR_ACCESS_TOKEN")
@@ -20,15 +42,46 @@ class LinearConnector:
             raise Exception("No Linear access token provided")
 
         self.access_token = access_token
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.rate_limiter = rate_limiter
+        if url is not None:
+            self.url = url
 
         self._check_permissions()
 
-    def _post_request(self, query, variables={}):
-        r = requests.post(
-            self.url,
-            json={"query": query, "variables": variables},
-            headers={"Authorization": self.access_token},
-        )
+    def _post_request(self, query, variables={}, retry_server_errors=True):
+        # server errors are only retried for idempotent operations, a failed
+        # mutation might have been applied already
+        retry_count = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            r = requests.post(
+                self.url,
+                json={"query": query, "variables": variables},
+                headers={"Authorization": self.access_token},
+            )
+
+            # retry rate limited and server errors with exponential backoff
+            retryable = r.status_code == 429 or (
+                retry_server_errors and r.status_code >= 500
+            )
+            retry = retryable and retry_count < self.max_retries
+            count_http_response("linear", r, retried=retry)
+            if not retry:
+                break
+
+            if r.status_code == 429 and "Retry-After" in r.headers:
+                delay = float(r.headers["Retry-After"])
+            else:
+                delay = self.retry_delay * 2**retry_count
+            logger.warning(
+                f"Linear request failed with {r.status_code}, retrying in {delay:.2f}s"
+            )
+            time.sleep(delay)
+            retry_count += 1
+
         if r.status_code == 200:
             return r.status_code, r.json()
         else:
@@ -47,6 +100,7 @@ class LinearConnector:
             }"""
         return self._post_request(query)
 
+    @metrics.timed("linear.get_team_and_projects")
     def get_team_and_projects(self, team_name: str) -> t.Tuple[str, str, dict]:
         query = """
             query ProjectsByTeam($team_name: String){
@@ -62,6 +116,8 @@ class LinearConnector:
                                 targetDate
                                 state
                                 url
+                                progress
+                                updatedAt
                             }
                         }
                     }
@@ -75,8 +131,33 @@ class LinearConnector:
 
         team_id = response[0]["id"]
         team_name = response[0]["name"]
-        projects = response[0]["projects"]["nodes"]
+        projects = self._projects_frame(response[0]["projects"]["nodes"])
+
+        return team_id, team_name, projects
+
+    @metrics.timed("linear.get_projects")
+    def get_projects(self, project_ids: t.List[str]) -> pd.DataFrame:
+        query = """
+            query ProjectsById($project_ids: [ID!]) {
+                projects(filter: {id: {in: $project_ids}}) {
+                    nodes {
+                        id
+                        name
+                        startDate
+                        targetDate
+                        state
+                        url
+                        progress
+                        updatedAt
+                    }
+                }
+            }
+            """
+        variables = {"project_ids": list(project_ids)}
+        _, response = self._post_request(query, variables)
+        return self._projects_frame(response["data"]["projects"]["nodes"])
 
+    def _projects_frame(self, projects) -> pd.DataFrame:
         projects = [
             {
                 "linear_project_id": p["id"],
@@ -85,26 +166,72 @@ class LinearConnector:
                 "linear_target_date": p["targetDate"],
                 "linear_state": p["state"],
                 "linear_url": p["url"],
+                "linear_progress": p["progress"],
+                "linear_updated_at": p["updatedAt"],
             }
             for p in projects
         ]
 
         if len(projects) == 0:
-            columns = [
-                "linear_project_id",
-                "linear_project_name",
-                "linear_start_date",
-                "linear_target_date",
-                "linear_state",
-                "linear_url",
-            ]
-            projects = pd.DataFrame(columns=columns)
+            projects = pd.DataFrame(columns=PROJECT_COLUMNS)
         else:
             projects = pd.DataFrame(projects)
+        return apply_linear_project_schema(projects)
 
-        return team_id, team_name, projects
+    def create_project(self, name: str, team_id: str, check_existing=True) -> str:
+        if check_existing:
+            project_id = self._find_project_by_name(name, team_id)
+            if project_id is not None:
+                logger.warning(
+                    f"Project {name} already exists in team {team_id}. Skipping creation."
+                )
+                return project_id
 
-    def create_project(self, name: str, team_id: str) -> str:
+        query = """
+            mutation ProjectCreate($project_name: String!, $team_id: String!) {
+                projectCreate(
+                    input: {
+                        name: $project_name,
+                        teamIds: [$team_id]
+                        state: "planned"
+                    }
+                ) {
+                    success 
+                    project {
+                        id
+                    }
+                }
+            }
+            """
+        variables = {"project_name": name, "team_id": team_id}
+
+        # creating a project is not idempotent: if the request failed, it is
+        # only sent again if the project does not exist by now
+        retry_count = 0
+        while True:
+            try:
+                _, response = self._post_request(
+                    query, variables, retry_server_errors=False
+                )
+                return response["data"]["projectCreate"]["project"]["id"]
+            except Exception as e:
+                project_id = self._find_project_by_name(name, team_id)
+                if project_id is not None:
+                    logger.warning(
+                        f"Creating Linear project {name} failed but it was created anyway"
+                    )
+                    return project_id
+                if retry_count >= self.max_retries:
+                    raise e
+
+            delay = self.retry_delay * 2**retry_count
+            logger.warning(
+                f"Creating Linear project {name} failed, retrying in {delay:.2f}s"
+            )
+            time.sleep(delay)
+            retry_count += 1
+
+    def _find_project_by_name(self, name: str, team_id: str) -> t.Optional[str]:
         query = """
             query ProjectsByName($project_name: String!) {
                 projects(filter: {name: {eq: $project_name}}) {
@@ -129,54 +256,34 @@ class LinearConnector:
         ]
 
         if len(project_ids) > 0:
-            logger.warning(
-                f"Project {name} already exists in team {team_id}. Skipping creation."
-            )
             return project_ids[0]
+        return None
 
-        query = """
-            mutation ProjectCreate($project_name: String!, $team_id: String!) {
-                projectCreate(
-                    input: {
-                        name: $project_name,
-                        teamIds: [$team_id]
-                        state: "planned"
-                    }
-                ) {
-                    success 
-                    project {
-                        id
-                    }
-                }
-            }
-            """
-        variables = {"project_name": name, "team_id": team_id}
-        _, response = self._post_request(query, variables)
-
-        return response["data"]["projectCreate"]["project"]["id"]
+    def _parse_date(self, value):
+        if isinstance(value, str):
+            return datetime.strptime(value, "%Y-%m-%d")
+        return parse_date(value)
 
     def update_project(
         self,
         project_id: str,
-        start_date: str = None,
-        target_date: str = None,
+        name: str = None,
+        start_date: t.Union[str, date] = None,
+        target_date: t.Union[str, date] = None,
         state: str = None,
         description: str = None,
         color: str = None,
         sort_order: int = None,
     ) -> str:
 
-        # input validation
+        # input validation, dates may be given as YYYY-MM-DD or date-like
         try:
-            if start_date is not None:
-                t1 = datetime.strptime(start_date, "%Y-%m-%d")
-            if target_date is not None:
-                t2 = datetime.strptime(target_date, "%Y-%m-%d")
-
+            t1 = self._parse_date(start_date)
+            t2 = self._parse_date(target_date)
         except ValueError:
             raise Exception("Incorrect date format, should be YYYY-MM-DD")
 
-        if (start_date is not None) and (target_date is not None) and (t1 > t2):
+        if (t1 is not None) and (t2 is not None) and (t1 > t2):
             raise Exception("Start date should be before target date")
 
         if state not in [
@@ -194,10 +301,11 @@ class LinearConnector:
 
         # query
         query = """
-            mutation UpdateProject($project_id: String!, $startDate: TimelessDate, $targetDate: TimelessDate, $description: String, $state: String = "planned", $color: String, $sortOrder: Float) {
+            mutation UpdateProject($project_id: String!, $name: String, $startDate: TimelessDate, $targetDate: TimelessDate, $description: String, $state: String = "planned", $color: String, $sortOrder: Float) {
                 projectUpdate(
                     id: $project_id
                     input: {
+                        name: $name
                         startDate: $startDate
                         targetDate: $targetDate
                         description: $description
@@ -216,10 +324,12 @@ class LinearConnector:
 
         # variables
         variables = {"project_id": project_id}
-        if start_date is not None:
-            variables["startDate"] = start_date
-        if target_date is not None:
-            variables["targetDate"] = target_date
+        if name is not None:
+            variables["name"] = name
+        if t1 is not None:
+            variables["startDate"] = t1.strftime("%Y-%m-%d")
+        if t2 is not None:
+            variables["targetDate"] = t2.strftime("%Y-%m-%d")
         if description is not None:
             variables["description"] = description
         if state is not None:
@@ -0,0 +1,142 @@
+import re
+import typing as t
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from asananas.instrumentation import metrics
+
+WEEK_LABEL_PATTERN = r"^([0-9]{4})-CW([0-9]{1,2})$"
+
+
+def _parse_bound(value, is_end):
+    # a date or a week label as created by `_week_label`, e.g. "2022-CW12"
+    if isinstance(value, str):
+        match = re.match(WEEK_LABEL_PATTERN, value)
+        if match is not None:
+            year, week = int(match.group(1)), int(match.group(2))
+            return pd.Timestamp(date.fromisocalendar(year, week, 7 if is_end else 1))
+    return pd.Timestamp(value).normalize()
+
+
+class LoadIndex:
+    """Per-person prefix sums of the daily allocation for fast range queries.
+
+    The index is built once from the output of `extract_allocation_data`.
+    The sparse (person, workday, allocation) entries are accumulated into a
+    person x workday matrix and its cumulative sum along the workdays, so
+    that the load of any person (or all people at once) in any date range
+    is a difference of two prefix sums. Start and end of a range are dates
+    or week labels like "2022-CW12" and both are inclusive.
+    """
+
+    def __init__(self, df_allocation_data: pd.DataFrame, n_workdays_per_week=5):
+        self.n_workdays_per_week = n_workdays_per_week
+        self._weekmask = [1] * n_workdays_per_week + [0] * (7 - n_workdays_per_week)
+
+        dates = pd.to_datetime(df_allocation_data["date"])
+        name_codes, names = pd.factorize(df_allocation_data["name"], sort=True)
+        self.names = list(names)
+        self._codes = {name: i for i, name in enumerate(self.names)}
+
+        # workday axis
+        if len(dates) > 0:
+            days = pd.date_range(dates.min(), dates.max(), freq="D")
+        else:
+            days = pd.DatetimeIndex([])
+        self.dates = days[days.dayofweek < n_workdays_per_week]
+
+        n_days = len(self.dates)
+        day = self.dates.searchsorted(dates)
+        daily = np.bincount(
+            name_codes * n_days + day,
+            weights=df_allocation_data["allocation"].to_numpy(dtype=float),
+            minlength=len(self.names) * n_days,
+        ).reshape(len(self.names), n_days)
+
+        self._daily = daily
+        self._prefix = np.zeros((len(self.names), n_days + 1))
+        np.cumsum(daily, axis=1, out=self._prefix[:, 1:])
+
+        metrics.increment("load_index.builds")
+
+    def _range(self, start, end):
+        t1 = _parse_bound(start, is_end=False)
+        t2 = _parse_bound(end, is_end=True)
+        i1 = self.dates.searchsorted(t1, side="left")
+        i2 = self.dates.searchsorted(t2, side="right")
+        n_workdays = max(
+            0,
+            int(
+                np.busday_count(
+                    t1.date(), (t2 + timedelta(days=1)).date(), weekmask=self._weekmask
+                )
+            ),
+        )
+        return i1, max(i1, i2), n_workdays
+
+    def _rows(self, names):
+        if names is None:
+            return np.arange(len(self.names))
+        return np.array([self._codes[n] for n in names if n in self._codes], dtype=int)
+
+    def load(self, name: str, start, end) -> float:
+        # allocated person-days of one person
+        if name not in self._codes:
+            return 0.0
+        i1, i2, _ = self._range(start, end)
+        row = self._prefix[self._codes[name]]
+        return float(row[i2] - row[i1])
+
+    def total_load(self, start, end, names: t.Sequence[str] = None) -> float:
+        # allocated person-days of a group of people, e.g. a team
+        i1, i2, _ = self._range(start, end)
+        rows = self._rows(names)
+        return float((self._prefix[rows, i2] - self._prefix[rows, i1]).sum())
+
+    def utilization(self, start, end, names: t.Sequence[str] = None) -> pd.Series:
+        # average daily allocation by person
+        i1, i2, n_workdays = self._range(start, end)
+        rows = self._rows(names)
+        load = self._prefix[rows, i2] - self._prefix[rows, i1]
+        utilization = load / n_workdays if n_workdays > 0 else np.zeros(len(rows))
+        return pd.Series(
+            utilization,
+            index=pd.Index([self.names[i] for i in rows], name="name"),
+            name="utilization",
+        )
+
+    def available_people(
+        self,
+        start,
+        end,
+        fraction: float = 0.5,
+        capacity: float = 1.0,
+        strict: bool = False,
+        names: t.Sequence[str] = None,
+    ) -> pd.DataFrame:
+        """People who have at least `fraction` of their capacity free.
+
+        By default the average allocation in the range counts. With `strict`
+        the allocation must not exceed `capacity - fraction` on any workday.
+        """
+        i1, i2, _ = self._range(start, end)
+        df = self.utilization(start, end, names=names).to_frame()
+        df["peak_allocation"] = (
+            self._daily[self._rows(names), i1:i2].max(axis=1, initial=0)
+            if strict
+            else np.nan
+        )
+        df["free_capacity"] = capacity - df["utilization"]
+
+        threshold = capacity - fraction + 1e-9
+        is_available = df["utilization"] <= threshold
+        if strict:
+            is_available &= df["peak_allocation"] <= threshold
+
+        return (
+            df[is_available]
+            .sort_values("free_capacity", ascending=False)
+            .reset_index()[["name", "utilization", "peak_allocation", "free_capacity"]]
+        )
@@ -0,0 +1,485 @@
+import json
+import random
+import re
+import threading
+import time
+import typing as t
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+class _MockServer:
+    """Local HTTP stand-in with configurable latency, rate limit and errors.
+
+    `latency` is added to every request (plus a uniform random `jitter`),
+    `rate_limit` is the number of requests per second allowed by a token
+    bucket before answering with 429, and `error_rate` is the probability of
+    answering a request with a 500.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: float = None,
+        error_rate: float = 0.0,
+        seed: int = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.host = host
+        self.port = port
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit
+        self._last_refill = time.monotonic()
+        self._httpd = None
+        self._thread = None
+
+        self.stats = {"requests": 0, "rate_limited": 0, "injected_errors": 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length > 0 else b""
+                status, headers, payload = server._process(
+                    method, self.path, dict(self.headers), body
+                )
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PUT(self):
+                self._dispatch("PUT")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"{self.__class__.__name__} listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _take_token(self) -> float:
+        # returns 0 if the request may pass, otherwise the seconds to wait
+        if self.rate_limit is None:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate_limit,
+                self._tokens + (now - self._last_refill) * self.rate_limit,
+            )
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate_limit
+
+    def _process(self, method, path, headers, body):
+        with self._lock:
+            self.stats["requests"] += 1
+            inject_error = self._random.random() < self.error_rate
+            delay = self.latency + self._random.uniform(0, self.jitter)
+
+        if delay > 0:
+            time.sleep(delay)
+
+        retry_after = self._take_token()
+        if retry_after > 0:
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            return (
+                429,
+                {"Retry-After": f"{retry_after:.3f}"},
+                {"errors": [{"message": "Rate limit exceeded"}]},
+            )
+
+        if inject_error:
+            with self._lock:
+                self.stats["injected_errors"] += 1
+            return 500, {}, {"errors": [{"message": "Injected server error"}]}
+
+        url = urlparse(path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        payload = json.loads(body) if body else {}
+        try:
+            with self._lock:
+                return self.handle(method, url.path, query, payload)
+        except KeyError as e:
+            return 404, {}, {"errors": [{"message": f"Not found: {e}"}]}
+
+    def handle(self, method, path, query, payload):
+        raise NotImplementedError
+
+
+class MockAsanaServer(_MockServer):
+    """Emulates the Asana REST endpoints used by `AsanaConnector`.
+
+    Point a connector at it via
+    `AsanaConnector(access_token="mock", base_url=server.base_url)`. As the
+    asana client uses an OAuth session, `OAUTHLIB_INSECURE_TRANSPORT=1` has to
+    be set to allow plain http.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.workspaces = {}
+        self.projects = {}
+        self.tasks = {}
+        self.project_tasks = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/api/1.0"
+
+    def _gid(self):
+        return str(uuid.uuid4().int)[:16]
+
+    def add_workspace(self, name: str) -> str:
+        gid = self._gid()
+        self.workspaces[gid] = {"gid": gid, "name": name, "resource_type": "workspace"}
+        return gid
+
+    def add_project(self, workspace_id: str, name: str) -> str:
+        gid = self._gid()
+        self.projects[gid] = {
+            "gid": gid,
+            "name": name,
+            "resource_type": "project",
+            "workspace": workspace_id,
+        }
+        self.project_tasks[gid] = []
+        return gid
+
+    def add_task(
+        self,
+        project_id: str,
+        name: str,
+        start_on: str = None,
+        due_on: str = None,
+        allocation: str = None,
+        assignee: str = None,
+        section: str = None,
+        linear_project: bool = False,
+        completed: bool = False,
+        resource_subtype: str = "default_task",
+    ) -> str:
+        gid = self._gid()
+        membership = {
+            "project": {"gid": project_id, "name": self.projects[project_id]["name"]}
+        }
+        if section is not None:
+            membership["section"] = {"gid": self._gid(), "name": section}
+
+        self.tasks[gid] = {
+            "gid": gid,
+            "name": name,
+            "resource_type": "task",
+            "resource_subtype": resource_subtype,
+            "start_on": start_on,
+            "due_on": due_on,
+            "completed": completed,
+            "assignee": None if assignee is None else {"name": assignee},
+            "permalink_url": f"https://app.asana.com/0/{project_id}/{gid}",
+            "tags": [{"name": "Linear Project"}] if linear_project else [],
+            "memberships": [membership],
+            "modified_at": _now(),
+            "custom_fields": [
+                {
+                    "gid": "allocation",
+                    "name": "Allocation",
+                    "resource_subtype": "text",
+                    "text_value": allocation,
+                    "display_value": allocation,
+                },
+                {
+                    "gid": "linear_progress",
+                    "name": "Linear Progress",
+                    "resource_subtype": "number",
+                    "precision": 0,
+                    "number_value": None,
+                    "display_value": None,
+                },
+                {
+                    "gid": "linear_state",
+                    "name": "Linear State",
+                    "resource_subtype": "text",
+                    "text_value": None,
+                    "display_value": None,
+                },
+                {
+                    "gid": "linear_url",
+                    "name": "Linear URL",
+                    "resource_subtype": "text",
+                    "text_value": None,
+                    "display_value": None,
+                },
+            ],
+        }
+        self.project_tasks[project_id].append(gid)
+        return gid
+
+    def generate_tasks(
+        self,
+        project_id: str,
+        n_tasks: int,
+        names: t.List[str] = ("Goofy", "DonaldDuck", "MickeyMouse", "Pluto"),
+        sections: t.List[str] = ("Backlog", "Research", "Engineering"),
+        linear_fraction: float = 0.5,
+        start: date = None,
+    ) -> t.List[str]:
+        start = date.today() if start is None else start
+        gids = []
+        for i in range(n_tasks):
+            t1 = start + timedelta(days=self._random.randint(-60, 120))
+            t2 = t1 + timedelta(days=self._random.randint(1, 40))
+            people = self._random.sample(list(names), self._random.randint(1, 2))
+            allocation = ", ".join(
+                f"{p}: {self._random.choice([10, 20, 30, 50])}%" for p in people
+            )
+            gids.append(
+                self.add_task(
+                    project_id,
+                    f"Task {i}",
+                    start_on=t1.strftime("%Y-%m-%d"),
+                    due_on=t2.strftime("%Y-%m-%d"),
+                    allocation=allocation,
+                    assignee=people[0],
+                    section=self._random.choice(list(sections)),
+                    linear_project=self._random.random() < linear_fraction,
+                )
+            )
+        return gids
+
+    def _update_task(self, gid, data):
+        task = self.tasks[gid]
+        custom_field_values = data.pop("custom_fields", {})
+        task.update(data)
+        for custom_field in task["custom_fields"]:
+            if custom_field["gid"] in custom_field_values:
+                value = custom_field_values[custom_field["gid"]]
+                custom_field[f"{custom_field['resource_subtype']}_value"] = value
+                if value is None:
+                    custom_field["display_value"] = None
+                elif custom_field["resource_subtype"] == "number":
+                    custom_field["display_value"] = (
+                        f"{value:.{custom_field['precision']}f}"
+                    )
+                else:
+                    custom_field["display_value"] = str(value)
+        task["modified_at"] = _now()
+
+    def handle(self, method, path, query, payload):
+        path = path[len("/api/1.0") :] if path.startswith("/api/1.0") else path
+        parts = path.strip("/").split("/")
+
+        if method == "GET" and parts == ["workspaces"]:
+            return 200, {}, {"data": list(self.workspaces.values())}
+
+        if method == "GET" and parts[0] == "workspaces" and parts[2:] == ["projects"]:
+            data = [p for p in self.projects.values() if p["workspace"] == parts[1]]
+            return 200, {}, {"data": data}
+
+        if method == "GET" and parts[0] == "projects" and parts[2:] == ["tasks"]:
+            task_ids = self.project_tasks[parts[1]]
+            limit = int(query.get("limit", 50))
+            offset = int(query.get("offset", 0))
+            data = [
+                {"gid": gid, "name": self.tasks[gid]["name"], "resource_type": "task"}
+                for gid in task_ids[offset : offset + limit]
+            ]
+            next_page = None
+            if offset + limit < len(task_ids):
+                next_page = {"offset": str(offset + limit), "path": path}
+            return 200, {}, {"data": data, "next_page": next_page}
+
+        if parts[0] == "tasks" and len(parts) == 2:
+            if method == "PUT":
+                self._update_task(parts[1], payload.get("data", {}))
+            return 200, {}, {"data": self.tasks[parts[1]]}
+
+        if method == "POST" and parts == ["batch"]:
+            actions = payload["data"]["actions"]
+            if len(actions) > 10:
+                return 400, {}, {"errors": [{"message": "Too many actions"}]}
+            data = []
+            for action in actions:
+                status, _, body = self.handle(
+                    action["method"].upper(),
+                    action["relative_path"],
+                    {},
+                    {"data": action.get("data", {})},
+                )
+                data.append({"status_code": status, "headers": {}, "body": body})
+            return 200, {}, {"data": data}
+
+        return 404, {}, {"errors": [{"message": f"Unknown endpoint {path}"}]}
+
+
+class MockLinearServer(_MockServer):
+    """Emulates the Linear GraphQL operations used by `LinearConnector`.
+
+    Point a connector at it via
+    `LinearConnector(access_token="mock", url=server.graphql_url)`.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.teams = {}
+        self.projects = {}
+
+    @property
+    def graphql_url(self) -> str:
+        return f"{self.url}/graphql"
+
+    def add_team(self, name: str) -> str:
+        team_id = str(uuid.uuid4())
+        self.teams[team_id] = {"id": team_id, "name": name}
+        return team_id
+
+    def add_project(self, team_id: str, name: str, state: str = "planned") -> str:
+        project_id = str(uuid.uuid4())
+        self.projects[project_id] = {
+            "id": project_id,
+            "name": name,
+            "startDate": None,
+            "targetDate": None,
+            "state": state,
+            "url": f"https://linear.app/mock/project/{project_id}",
+            "description": None,
+            "color": None,
+            "sortOrder": None,
+            "progress": 0.0,
+            "updatedAt": _now(),
+            "team_id": team_id,
+        }
+        return project_id
+
+    def _project_node(self, project):
+        return {k: v for k, v in project.items() if k != "team_id"}
+
+    def handle(self, method, path, query, payload):
+        if method != "POST" or path != "/graphql":
+            return 404, {}, {"errors": [{"message": f"Unknown endpoint {path}"}]}
+
+        match = re.search(r"(query|mutation)\s+(\w+)", payload.get("query", ""))
+        operation = match.group(2) if match else None
+        variables = payload.get("variables", {})
+
+        if operation == "Me":
+            data = {"viewer": {"id": "mock", "name": "Mock", "email": "mock@mock"}}
+
+        elif operation == "ProjectsByTeam":
+            nodes = [
+                {
+                    "id": team["id"],
+                    "name": team["name"],
+                    "projects": {
+                        "nodes": [
+                            self._project_node(p)
+                            for p in self.projects.values()
+                            if p["team_id"] == team["id"]
+                        ]
+                    },
+                }
+                for team in self.teams.values()
+                if team["name"] == variables.get("team_name")
+            ]
+            data = {"teams": {"nodes": nodes}}
+
+        elif operation == "ProjectsByName":
+            nodes = [
+                {
+                    "id": p["id"],
+                    "teams": {"nodes": [self.teams[p["team_id"]]]},
+                }
+                for p in self.projects.values()
+                if p["name"] == variables.get("project_name")
+            ]
+            data = {"projects": {"nodes": nodes}}
+
+        elif operation == "ProjectsById":
+            nodes = [
+                self._project_node(self.projects[project_id])
+                for project_id in variables.get("project_ids", [])
+                if project_id in self.projects
+            ]
+            data = {"projects": {"nodes": nodes}}
+
+        elif operation == "ProjectCreate":
+            project_id = self.add_project(
+                variables["team_id"], variables["project_name"]
+            )
+            data = {"projectCreate": {"success": True, "project": {"id": project_id}}}
+
+        elif operation == "UpdateProject":
+            project = self.projects.get(variables.get("project_id"))
+            if project is None:
+                return 200, {}, {"errors": [{"message": "Entity not found"}]}
+            for key in [
+                "name",
+                "startDate",
+                "targetDate",
+                "description",
+                "state",
+                "color",
+            ]:
+                if key in variables:
+                    project[key] = variables[key]
+            project["updatedAt"] = _now()
+            data = {
+                "projectUpdate": {"success": True, "project": {"id": project["id"]}}
+            }
+
+        else:
+            return 400, {}, {"errors": [{"message": f"Unknown operation {operation}"}]}
+
+        return 200, {}, {"data": data}
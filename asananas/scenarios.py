@@ -0,0 +1,256 @@
+import typing as t
+
+import numpy as np
+import pandas as pd
+
+from asananas.instrumentation import metrics
+
+
+class Shift:
+    """Move all allocations of a project by `n_workdays` (negative = earlier)."""
+
+    def __init__(self, project: str, n_workdays: int) -> None:
+        self.project = project
+        self.n_workdays = n_workdays
+
+
+class Reassign:
+    """Move a `fraction` of `from_name`'s load (optionally of one project only) to `to_name`."""
+
+    def __init__(
+        self, from_name: str, to_name: str, fraction: float = 1.0, project: str = None
+    ) -> None:
+        self.from_name = from_name
+        self.to_name = to_name
+        self.fraction = fraction
+        self.project = project
+
+
+class Scale:
+    """Multiply the load of a project and/or a person by `factor`."""
+
+    def __init__(self, factor: float, project: str = None, name: str = None) -> None:
+        self.factor = factor
+        self.project = project
+        self.name = name
+
+
+class ScenarioEngine:
+    """What-if analysis on top of the output of `extract_allocation_data`.
+
+    The load of a task is a person x workday matrix which is constant over
+    the workdays of the task, so it is stored as segments (project, person,
+    first workday, last workday + 1, daily allocation). Edits are applied as
+    array operations on these segments and the person x workday load of many
+    scenarios is computed at once with a difference array. The workday axis
+    is padded by `padding_weeks` on both sides so that shifted tasks stay on
+    the axis.
+    """
+
+    def __init__(
+        self,
+        df_allocation_data: pd.DataFrame,
+        n_workdays_per_week: int = 5,
+        padding_weeks: int = 26,
+    ) -> None:
+        self.n_workdays_per_week = n_workdays_per_week
+
+        df = (
+            df_allocation_data.assign(date=pd.to_datetime(df_allocation_data["date"]))
+            .groupby(["project", "name", "date"], sort=True)["allocation"]
+            .sum()
+            .reset_index()
+        )
+
+        # workday axis
+        padding = pd.Timedelta(weeks=padding_weeks)
+        dates = pd.date_range(
+            df["date"].min() - padding, df["date"].max() + padding, freq="D"
+        )
+        self.dates = dates[dates.dayofweek < n_workdays_per_week]
+
+        project_codes, self.projects = pd.factorize(df["project"], sort=True)
+        name_codes, names = pd.factorize(df["name"], sort=True)
+        self.projects = list(self.projects)
+        self.names = list(names)
+        day = self.dates.searchsorted(df["date"])
+        value = df["allocation"].to_numpy(dtype=float)
+
+        # consecutive workdays with the same allocation form one segment
+        is_new = np.ones(len(df), dtype=bool)
+        is_new[1:] = (
+            (project_codes[1:] != project_codes[:-1])
+            | (name_codes[1:] != name_codes[:-1])
+            | (day[1:] != day[:-1] + 1)
+            | (value[1:] != value[:-1])
+        )
+        first = np.flatnonzero(is_new)
+        last = np.append(first[1:], len(df)) - 1
+
+        self._segments = {
+            "project": project_codes[first],
+            "person": name_codes[first],
+            "start": day[first],
+            "end": day[last] + 1,
+            "value": value[first],
+        }
+
+    def __len__(self):
+        return len(self._segments["value"])
+
+    def _project_code(self, project):
+        if project not in self.projects:
+            raise Exception(f"Unknown project {project}")
+        return self.projects.index(project)
+
+    def _person_code(self, name, names, add=False):
+        # people who are new to the plan are only added to the `names` of the
+        # scenarios at hand, the engine itself stays unchanged
+        if name not in names:
+            if not add:
+                raise Exception(f"Unknown person {name}")
+            names.append(name)
+        return names.index(name)
+
+    def _mask(self, segments, names, project=None, name=None):
+        mask = np.ones(len(segments["value"]), dtype=bool)
+        if project is not None:
+            mask &= segments["project"] == self._project_code(project)
+        if name is not None:
+            mask &= segments["person"] == self._person_code(name, names)
+        return mask
+
+    def _apply(self, edits, names):
+        segments = {k: v.copy() for k, v in self._segments.items()}
+
+        for edit in edits:
+            if isinstance(edit, Shift):
+                mask = self._mask(segments, names, project=edit.project)
+                segments["start"][mask] += edit.n_workdays
+                segments["end"][mask] += edit.n_workdays
+
+            elif isinstance(edit, Scale):
+                mask = self._mask(segments, names, project=edit.project, name=edit.name)
+                segments["value"][mask] *= edit.factor
+
+            elif isinstance(edit, Reassign):
+                mask = self._mask(
+                    segments, names, project=edit.project, name=edit.from_name
+                )
+                moved = {k: v[mask] for k, v in segments.items()}
+                moved["person"] = np.full_like(
+                    moved["person"], self._person_code(edit.to_name, names, add=True)
+                )
+                moved["value"] = moved["value"] * edit.fraction
+                segments["value"][mask] *= 1 - edit.fraction
+                segments = {
+                    k: np.concatenate([segments[k], moved[k]]) for k in segments
+                }
+
+            else:
+                raise Exception(f"Unknown edit {edit}")
+
+        n_days = len(self.dates)
+        segments["start"] = np.clip(segments["start"], 0, n_days)
+        segments["end"] = np.clip(segments["end"], 0, n_days)
+        return segments
+
+    def _load(self, scenarios):
+        # resolve all edits first, reassignments may add people to the batch
+        names = list(self.names)
+        all_segments = [self._apply(edits, names) for edits in scenarios]
+
+        n_people = len(names)
+        n_days = len(self.dates)
+        offsets = []
+        weights = []
+        for i, segments in enumerate(all_segments):
+            row = (i * n_people + segments["person"]) * (n_days + 1)
+            offsets.extend([row + segments["start"], row + segments["end"]])
+            weights.extend([segments["value"], -segments["value"]])
+
+        diff = np.bincount(
+            np.concatenate(offsets),
+            weights=np.concatenate(weights),
+            minlength=len(all_segments) * n_people * (n_days + 1),
+        )
+        diff = diff.reshape(len(all_segments), n_people, n_days + 1)
+        return np.cumsum(diff, axis=2)[:, :, :n_days], names
+
+    def load_matrix(self, edits: t.Sequence = ()) -> np.ndarray:
+        # daily allocation, rows follow `scenario_names(edits)` and columns
+        # `self.dates`
+        return self._load([edits])[0][0]
+
+    def scenario_names(self, edits: t.Sequence = ()) -> t.List[str]:
+        # `self.names` followed by the people added by reassignments
+        names = list(self.names)
+        self._apply(edits, names)
+        return names
+
+    @metrics.timed("scenarios.evaluate")
+    def evaluate(self, scenarios, capacity: float = 1.0, chunk_size: int = 64):
+        """Over-allocation summary for each scenario.
+
+        `scenarios` is a dict or a list of edit lists. Returns one row per
+        scenario with the peak daily allocation, the number of person-days
+        above `capacity` and the total excess load in person-weeks.
+        """
+        if isinstance(scenarios, dict):
+            labels, scenarios = list(scenarios), list(scenarios.values())
+        else:
+            labels, scenarios = list(range(len(scenarios))), list(scenarios)
+
+        results = []
+        for i in range(0, len(scenarios), chunk_size):
+            load, _ = self._load(scenarios[i : i + chunk_size])
+            excess = np.clip(load - capacity, 0, None)
+            results.append(
+                pd.DataFrame(
+                    {
+                        "peak_allocation": load.max(axis=(1, 2), initial=0),
+                        "over_allocated_person_days": (excess > 1e-9).sum(axis=(1, 2)),
+                        "excess_person_weeks": excess.sum(axis=(1, 2))
+                        / self.n_workdays_per_week,
+                    }
+                )
+            )
+
+        metrics.increment("scenarios.evaluated", len(scenarios))
+
+        df = pd.concat(results, ignore_index=True)
+        df.insert(0, "scenario", labels)
+        return df
+
+    def to_allocation_data(self, edits: t.Sequence = ()) -> pd.DataFrame:
+        """The allocation data of a scenario, see `extract_allocation_data`.
+
+        The result can be passed to `visualize_allocation_by_week`, e.g. to
+        compare a scenario with the current plan side by side.
+        """
+        names = list(self.names)
+        segments = self._apply(edits, names)
+        n_days = segments["end"] - segments["start"]
+        keep = (n_days > 0) & (segments["value"] != 0)
+        segments = {k: v[keep] for k, v in segments.items()}
+        n_days = n_days[keep]
+
+        index = np.repeat(np.arange(len(n_days)), n_days)
+        offset = np.arange(len(index)) - np.repeat(np.cumsum(n_days) - n_days, n_days)
+        day = segments["start"][index] + offset
+
+        df = pd.DataFrame(
+            {
+                "date": self.dates[day],
+                "name": np.asarray(names, dtype=object)[segments["person"][index]],
+                "allocation": segments["value"][index],
+                "project": np.asarray(self.projects, dtype=object)[
+                    segments["project"][index]
+                ],
+            }
+        )
+        return (
+            df.groupby(["date", "name", "project"], sort=False)["allocation"]
+            .sum()
+            .reset_index()[["date", "name", "allocation", "project"]]
+        )
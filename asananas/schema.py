@@ -0,0 +1,70 @@
+import typing as t
+
+import pandas as pd
+
+# dates are parsed once when the data enters the system, everything downstream
+# works on native dtypes
+ASANA_TASK_DTYPES = {
+    "asana_task_id": "string",
+    "asana_task_name": "string",
+    "asana_start_on": "datetime64[ns]",
+    "asana_due_on": "datetime64[ns]",
+    "asana_completed": "boolean",
+    "asana_assignee": "category",
+    "asana_url": "string",
+    "asana_linear_project": "boolean",
+    "asana_section": "category",
+    "asana_allocation": "string",
+    "asana_modified_at": "datetime64[ns, UTC]",
+    "asana_linear_progress": "Float64",
+    "asana_linear_state": "string",
+    "asana_linear_url": "string",
+}
+
+LINEAR_PROJECT_DTYPES = {
+    "linear_project_id": "string",
+    "linear_project_name": "string",
+    "linear_start_date": "datetime64[ns]",
+    "linear_target_date": "datetime64[ns]",
+    "linear_state": "category",
+    "linear_url": "string",
+    "linear_progress": "Float64",
+    "linear_updated_at": "datetime64[ns, UTC]",
+}
+
+
+def parse_date(value) -> t.Optional[pd.Timestamp]:
+    if value is None or pd.isna(value):
+        return None
+    return pd.Timestamp(value)
+
+
+def _apply_schema(df: pd.DataFrame, dtypes: t.Dict[str, str]) -> pd.DataFrame:
+    df = df.copy()
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            continue
+        if dtype.startswith("datetime64"):
+            is_utc = "UTC" in dtype
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                if is_utc:
+                    df[column] = pd.to_datetime(df[column], utc=True)
+                else:
+                    df[column] = pd.to_datetime(df[column], format="%Y-%m-%d")
+            elif is_utc and df[column].dt.tz is None:
+                df[column] = df[column].dt.tz_localize("UTC")
+        elif dtype == "Float64" and df[column].dtype == object:
+            # e.g. a number in a text field
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+        # parsing picks its own resolution, e.g. datetime64[us] on pandas 3
+        if df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def apply_asana_task_schema(df_asana_tasks: pd.DataFrame) -> pd.DataFrame:
+    return _apply_schema(df_asana_tasks, ASANA_TASK_DTYPES)
+
+
+def apply_linear_project_schema(df_linear_projects: pd.DataFrame) -> pd.DataFrame:
+    return _apply_schema(df_linear_projects, LINEAR_PROJECT_DTYPES)
@@ -0,0 +1,185 @@
+import json
+import os
+import sys
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from loguru import logger
+
+from asananas.asana_connector import AsanaConnector
+from asananas.asana_linear_bridge import sync_asana_linear_frames
+from asananas.id_mapping import DEFAULT_ID_MAPPING_FILE, IdMappingIndex
+from asananas.instrumentation import metrics
+from asananas.linear_connector import LinearConnector
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by all connectors talking to one API."""
+
+    def __init__(self, rate: float, burst: int = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last_refill) * self.rate
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def load_sync_config(file_path: str) -> t.List[t.Dict]:
+    # a json list of {"asana_project_id": ..., "linear_team_name": ...}
+    with open(file_path, "r", encoding="utf-8") as f:
+        pairs = json.load(f)
+
+    for pair in pairs:
+        if "asana_project_id" not in pair or "linear_team_name" not in pair:
+            raise Exception(
+                f"Each sync pair needs an asana_project_id and a linear_team_name: {pair}"
+            )
+    return pairs
+
+
+@metrics.timed("bridge.sync_many")
+def sync_many(
+    pairs: t.List[t.Dict],
+    asana_access_token: str = None,
+    linear_access_token: str = None,
+    auto_create_linear_projects: bool = True,
+    sync_projects: bool = True,
+    cancel_linear_projects: bool = True,
+    write_back_to_asana: bool = False,
+    max_workers: int = 8,
+    asana_requests_per_second: float = 20,
+    linear_requests_per_second: float = 20,
+    id_mapping: IdMappingIndex = None,
+    asana_connector: AsanaConnector = None,
+    linear_connector: LinearConnector = None,
+) -> pd.DataFrame:
+    """Run the Asana-Linear bridge for many (Asana project, Linear team) pairs.
+
+    Connectors are created (and authenticated) once and share one rate budget
+    per API. Every Asana project and Linear team is fetched once, even if it
+    appears in several pairs, and pairs are synced concurrently. Pairs that
+    target the same Linear team are synced together, otherwise they would
+    cancel each other's projects. Returns one report row per Linear team.
+    """
+
+    if id_mapping is None:
+        id_mapping = IdMappingIndex(DEFAULT_ID_MAPPING_FILE)
+
+    if asana_connector is None:
+        asana_connector = AsanaConnector(
+            access_token=asana_access_token,
+            rate_limiter=RateLimiter(asana_requests_per_second),
+        )
+    if linear_connector is None:
+        linear_connector = LinearConnector(
+            access_token=linear_access_token,
+            rate_limiter=RateLimiter(linear_requests_per_second),
+        )
+
+    asana_project_ids = list(dict.fromkeys(p["asana_project_id"] for p in pairs))
+    linear_team_names = list(dict.fromkeys(p["linear_team_name"] for p in pairs))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        # fetch everything once
+        logger.info(
+            f"Fetching {len(asana_project_ids)} Asana projects and {len(linear_team_names)} Linear teams"
+        )
+        asana_futures = {
+            project_id: executor.submit(
+                asana_connector.get_all_tasks_for_project, project_id
+            )
+            for project_id in asana_project_ids
+        }
+        linear_futures = {
+            team_name: executor.submit(
+                linear_connector.get_team_and_projects, team_name
+            )
+            for team_name in linear_team_names
+        }
+
+        def _sync_team(team_name):
+            t0 = time.perf_counter()
+            project_ids = [
+                p["asana_project_id"]
+                for p in pairs
+                if p["linear_team_name"] == team_name
+            ]
+            report = {
+                "linear_team_name": team_name,
+                "asana_project_ids": project_ids,
+                "n_asana_tasks": None,
+                "n_linear_projects": None,
+                "created": 0,
+                "updated": 0,
+                "cancelled": 0,
+                "error": None,
+            }
+            try:
+                df_asana_tasks = pd.concat(
+                    [asana_futures[p].result() for p in dict.fromkeys(project_ids)],
+                    ignore_index=True,
+                ).drop_duplicates(subset="asana_task_id")
+                df_asana_tasks = df_asana_tasks[
+                    df_asana_tasks.asana_linear_project.fillna(False).astype(bool)
+                ]
+                team_id, _, df_linear_projects = linear_futures[team_name].result()
+
+                report["n_asana_tasks"] = len(df_asana_tasks)
+                report["n_linear_projects"] = len(df_linear_projects)
+                report.update(
+                    sync_asana_linear_frames(
+                        df_asana_tasks,
+                        df_linear_projects,
+                        team_id,
+                        linear_connector,
+                        auto_create_linear_projects,
+                        sync_projects,
+                        cancel_linear_projects,
+                        id_mapping=id_mapping,
+                        asana_connector=asana_connector,
+                        write_back_to_asana=write_back_to_asana,
+                    )
+                )
+            except Exception as e:
+                logger.error(f"Syncing Linear team {team_name} failed: {e}")
+                report["error"] = str(e)
+
+            report["duration_s"] = round(time.perf_counter() - t0, 3)
+            return report
+
+        reports = list(executor.map(_sync_team, linear_team_names))
+
+    id_mapping.save()
+
+    return pd.DataFrame(reports)
+
+
+def run():
+    if len(sys.argv) != 2:
+        raise Exception("Usage: asananas-sync <path to sync config json>")
+
+    df_report = sync_many(
+        load_sync_config(sys.argv[1]),
+        id_mapping=IdMappingIndex(
+            os.getenv("ASANANAS_ID_MAPPING_FILE", DEFAULT_ID_MAPPING_FILE)
+        ),
+    )
+    print(df_report.to_string(index=False))
@@ -1,10 +1,9 @@
 import pandas as pd
-from asananas.allocation_management import (
-    visualize_allocation_by_week,
-    extract_allocation_data,
-)
+from asananas.allocation_management import extract_allocation_data
+from asananas.figure_cache import FigureCache, cached_allocation_html
+from asananas.schema import apply_asana_task_schema
 
-df_asana_tasks = pd.read_pickle("dummy_data.pkl")
+df_asana_tasks = apply_asana_task_schema(pd.read_pickle("dummy_data.pkl"))
 (
     df_allocation_data,
     projects_with_no_allocation,
@@ -19,7 +18,14 @@ v = [
 ]
 
 df_allocation_data = df_allocation_data[df_allocation_data.name.isin(v)]
-fig = visualize_allocation_by_week(df_allocation_data, current_date="2022-09-30")
+
+# the figure is only rebuilt if the data or the parameters changed
+cache = FigureCache(cache_dir=".figure_cache")
+html = cached_allocation_html(
+    df_allocation_data, current_date="2022-09-30", cache=cache
+)
+print(f"Figure cache: {cache.stats}")
 
 # save plotly figure as html
-fig.write_html("../asananas/assets/demo_fig.html")
+with open("../asananas/assets/demo_fig.html", "w", encoding="utf-8") as f:
+    f.write(html)
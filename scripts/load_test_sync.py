@@ -0,0 +1,77 @@
+import argparse
+import os
+import time
+
+from asananas.asana_connector import AsanaConnector
+from asananas.asana_linear_bridge import sync_asana_linear
+from asananas.id_mapping import IdMappingIndex
+from asananas.instrumentation import metrics
+from asananas.linear_connector import LinearConnector
+from asananas.mock_servers import MockAsanaServer, MockLinearServer
+
+parser = argparse.ArgumentParser(
+    description="Load test the Asana-Linear bridge against local mock servers."
+)
+parser.add_argument("--n-tasks", type=int, default=10000)
+parser.add_argument("--n-existing-linear-projects", type=int, default=1000)
+parser.add_argument("--latency", type=float, default=0.0)
+parser.add_argument("--rate-limit", type=float, default=None)
+parser.add_argument("--error-rate", type=float, default=0.0)
+parser.add_argument("--seed", type=int, default=42)
+args = parser.parse_args()
+
+# the asana client uses an oauth session which refuses plain http otherwise
+os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+server_options = dict(
+    latency=args.latency,
+    rate_limit=args.rate_limit,
+    error_rate=args.error_rate,
+    seed=args.seed,
+)
+
+with MockAsanaServer(**server_options) as asana_server, MockLinearServer(
+    **server_options
+) as linear_server:
+
+    # dummy data
+    workspace_id = asana_server.add_workspace("My dummy company")
+    project_id = asana_server.add_project(workspace_id, "My dummy project")
+    task_ids = asana_server.generate_tasks(project_id, args.n_tasks)
+
+    team_id = linear_server.add_team("My dummy team")
+    for task_id in task_ids[: args.n_existing_linear_projects]:
+        linear_server.add_project(team_id, asana_server.tasks[task_id]["name"])
+    for i in range(args.n_existing_linear_projects // 10):
+        linear_server.add_project(team_id, f"Orphaned project {i}")
+
+    # sync
+    metrics.reset()
+    t0 = time.perf_counter()
+    sync_asana_linear(
+        project_id,
+        None,
+        "My dummy team",
+        None,
+        auto_create_linear_projects=True,
+        sync_projects=True,
+        cancel_linear_projects=True,
+        asana_connector=AsanaConnector(
+            access_token="mock", base_url=asana_server.base_url
+        ),
+        linear_connector=LinearConnector(
+            access_token="mock", url=linear_server.graphql_url, retry_delay=0.1
+        ),
+        # don't mix the mock ids into the persisted mapping
+        id_mapping=IdMappingIndex(),
+    )
+    duration = time.perf_counter() - t0
+
+    print(metrics.summary().to_string(index=False))
+    print()
+    print(f"Asana mock server: {asana_server.stats}")
+    print(f"Linear mock server: {linear_server.stats}")
+    print(
+        f"Synced {args.n_tasks} tasks in {duration:.1f}s "
+        f"({args.n_tasks / duration:.0f} tasks/s)"
+    )
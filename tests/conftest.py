@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+import pytest
+
+from asananas import asana_linear_bridge, sync_orchestrator
+from asananas.allocation_management import extract_allocation_data
+from asananas.asana_connector import AsanaConnector
+from asananas.instrumentation import metrics
+from asananas.linear_connector import LinearConnector
+from asananas.mock_servers import MockAsanaServer, MockLinearServer
+
+# the asana client uses an oauth session which refuses plain http otherwise
+os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture(autouse=True)
+def id_mapping_file(tmp_path, monkeypatch):
+    # never touch the id mapping in the home directory
+    file_path = str(tmp_path / "id_mapping.json")
+    monkeypatch.setattr(asana_linear_bridge, "DEFAULT_ID_MAPPING_FILE", file_path)
+    monkeypatch.setattr(sync_orchestrator, "DEFAULT_ID_MAPPING_FILE", file_path)
+    return file_path
+
+
+@pytest.fixture
+def asana_server():
+    with MockAsanaServer(seed=42) as server:
+        yield server
+
+
+@pytest.fixture
+def linear_server():
+    with MockLinearServer(seed=42) as server:
+        yield server
+
+
+@pytest.fixture
+def asana_connector(asana_server):
+    return AsanaConnector(access_token="mock", base_url=asana_server.base_url)
+
+
+@pytest.fixture
+def linear_connector(linear_server):
+    return LinearConnector(
+        access_token="mock", url=linear_server.graphql_url, retry_delay=0.01
+    )
+
+
+@pytest.fixture
+def make_allocation_data():
+    # allocation data of (name, start_on, due_on, allocation) tasks
+    def _make_allocation_data(*tasks):
+        df_asana_tasks = pd.DataFrame(
+            tasks,
+            columns=[
+                "asana_task_name",
+                "asana_start_on",
+                "asana_due_on",
+                "asana_allocation",
+            ],
+        )
+        df_asana_tasks["asana_start_on"] = pd.to_datetime(df_asana_tasks.asana_start_on)
+        df_asana_tasks["asana_due_on"] = pd.to_datetime(df_asana_tasks.asana_due_on)
+        df_allocation_data, _, _ = extract_allocation_data(df_asana_tasks)
+        return df_allocation_data
+
+    return _make_allocation_data
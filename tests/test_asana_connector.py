@@ -0,0 +1,77 @@
+import types
+
+import pandas as pd
+import pytest
+
+from asananas.allocation_management import extract_allocation_data
+from asananas.schema import ASANA_TASK_DTYPES, apply_asana_task_schema
+
+
+@pytest.fixture
+def project_id(asana_server):
+    workspace_id = asana_server.add_workspace("Workspace")
+    project_id = asana_server.add_project(workspace_id, "Workstreams")
+    for i in range(7):
+        asana_server.add_task(
+            project_id,
+            f"Task {i}",
+            "2024-01-08",
+            "2024-01-19",
+            f"Goofy: {10 * (i + 1)}%",
+            assignee=["Goofy", "Pluto", "Dingo"][i % 3],
+            section=["Backlog", "Research"][i % 2],
+        )
+        if i == 3:
+            asana_server.add_task(project_id, "Milestone", resource_subtype="milestone")
+    return project_id
+
+
+def test_iter_tasks_skips_other_task_types(asana_connector, project_id):
+    tasks = list(asana_connector.iter_tasks(project_id))
+
+    assert [t["asana_task_name"] for t in tasks] == [f"Task {i}" for i in range(7)]
+    assert tasks[0]["asana_assignee"] == "Goofy"
+    assert tasks[0]["asana_section"] == "Backlog"
+    assert tasks[0]["asana_allocation"] == "Goofy: 10%"
+
+
+def test_iter_task_batches(asana_connector, project_id):
+    batches = list(asana_connector.iter_task_batches(project_id, batch_size=3))
+
+    assert [len(df) for df in batches] == [3, 3, 1]
+    df = pd.concat(batches, ignore_index=True)
+    assert df.asana_task_name.tolist() == [f"Task {i}" for i in range(7)]
+    for df_batch in batches:
+        for column, dtype in ASANA_TASK_DTYPES.items():
+            assert df_batch[column].dtype == dtype, column
+
+    # the categories of the batches differ, the schema restores them
+    assert df.asana_assignee.dtype != "category"
+    df = apply_asana_task_schema(df)
+    assert df.asana_assignee.dtype == "category"
+    assert set(df.asana_assignee.cat.categories) == {"Goofy", "Pluto", "Dingo"}
+    pd.testing.assert_frame_equal(
+        df, asana_connector.get_all_tasks_for_project(project_id)
+    )
+
+
+def test_iter_task_batches_of_empty_project(asana_server, asana_connector):
+    workspace_id = asana_server.add_workspace("Workspace")
+    project_id = asana_server.add_project(workspace_id, "Empty")
+
+    assert list(asana_connector.iter_task_batches(project_id)) == []
+    assert len(asana_connector.get_all_tasks_for_project(project_id)) == 0
+
+
+def test_extract_allocation_data_consumes_batches(asana_connector, project_id):
+    batches = asana_connector.iter_task_batches(project_id, batch_size=2)
+    assert isinstance(batches, types.GeneratorType)
+
+    df, no_allocation, broken_allocation = extract_allocation_data(batches)
+    df_expected, _, _ = extract_allocation_data(
+        asana_connector.get_all_tasks_for_project(project_id)
+    )
+
+    pd.testing.assert_frame_equal(df, df_expected)
+    assert len(df) == 7 * 10
+    assert no_allocation == [] and broken_allocation == []
@@ -0,0 +1,293 @@
+import pytest
+
+from asananas.asana_linear_bridge import sync_asana_linear
+from asananas.id_mapping import IdMappingIndex
+from asananas.instrumentation import metrics
+from asananas.sync_orchestrator import sync_many
+
+
+def _sync(asana_connector, linear_connector, project_id, id_mapping=None, **kwargs):
+    options = {
+        "auto_create_linear_projects": True,
+        "sync_projects": False,
+        "cancel_linear_projects": False,
+        "write_back_to_asana": True,
+        **kwargs,
+    }
+    return sync_asana_linear(
+        project_id,
+        None,
+        "Team",
+        None,
+        asana_connector=asana_connector,
+        linear_connector=linear_connector,
+        id_mapping=id_mapping if id_mapping is not None else IdMappingIndex(),
+        **options,
+    )
+
+
+def _custom_field_value(asana_server, task_id, name):
+    for custom_field in asana_server.tasks[task_id]["custom_fields"]:
+        if custom_field["name"] == name:
+            return custom_field["display_value"]
+
+
+@pytest.fixture
+def project_id(asana_server):
+    workspace_id = asana_server.add_workspace("Workspace")
+    return asana_server.add_project(workspace_id, "Workstreams")
+
+
+@pytest.fixture
+def team_id(linear_server):
+    return linear_server.add_team("Team")
+
+
+@pytest.fixture
+def batch_requests(asana_server, monkeypatch):
+    # number of actions of every request to the batch api
+    requests = []
+    handle = asana_server.handle
+
+    def _handle(method, path, query, payload):
+        if path.endswith("/batch"):
+            requests.append(len(payload["data"]["actions"]))
+        return handle(method, path, query, payload)
+
+    monkeypatch.setattr(asana_server, "handle", _handle)
+    return requests
+
+
+def test_created_projects_are_written_back_in_the_same_run(
+    asana_server, linear_server, asana_connector, linear_connector, project_id, team_id
+):
+    task_id = asana_server.add_task(
+        project_id, "Alpha", "2024-01-08", "2024-01-19", linear_project=True
+    )
+
+    report = _sync(asana_connector, linear_connector, project_id)
+
+    assert report["created"] == 1
+    assert report["written_back"] == 1
+    (project,) = linear_server.projects.values()
+    assert _custom_field_value(asana_server, task_id, "Linear URL") == project["url"]
+    assert _custom_field_value(asana_server, task_id, "Linear State") == "planned"
+    assert _custom_field_value(asana_server, task_id, "Linear Progress") == "0"
+
+
+def test_write_back_is_batched_and_idempotent(
+    asana_server,
+    linear_server,
+    asana_connector,
+    linear_connector,
+    project_id,
+    team_id,
+    batch_requests,
+):
+    for i in range(25):
+        asana_server.add_task(
+            project_id, f"Task {i}", "2024-01-08", "2024-01-19", linear_project=True
+        )
+
+    report = _sync(asana_connector, linear_connector, project_id)
+
+    assert report["written_back"] == 25
+    assert batch_requests == [10, 10, 5]
+    counters, _ = metrics.snapshot()
+    assert counters["asana.batch_actions"] == 25
+
+    # nothing changed on Linear since
+    report = _sync(asana_connector, linear_connector, project_id)
+    assert report["created"] == 0
+    assert report["written_back"] == 0
+    assert batch_requests == [10, 10, 5]
+
+
+def test_progress_with_decimals_is_not_rewritten(
+    asana_server, linear_server, asana_connector, linear_connector, project_id, team_id
+):
+    task_id = asana_server.add_task(
+        project_id, "Alpha", "2024-01-08", "2024-01-19", linear_project=True
+    )
+    asana_server.tasks[task_id]["custom_fields"][1]["precision"] = 2
+
+    assert _sync(asana_connector, linear_connector, project_id)["written_back"] == 1
+    assert _custom_field_value(asana_server, task_id, "Linear Progress") == "0.00"
+
+    df_asana_tasks = asana_connector.get_all_tasks_for_project(project_id)
+    assert df_asana_tasks.asana_linear_progress.tolist() == [0.0]
+    assert _sync(asana_connector, linear_connector, project_id)["written_back"] == 0
+
+
+def _set_custom_field(asana_server, task_id, name, value):
+    # an edit by hand in Asana
+    for custom_field in asana_server.tasks[task_id]["custom_fields"]:
+        if custom_field["name"] == name:
+            custom_field[f"{custom_field['resource_subtype']}_value"] = value
+            custom_field["display_value"] = str(value)
+    asana_server.tasks[task_id]["modified_at"] = "2099-01-01T00:00:00.000Z"
+
+
+@pytest.fixture
+def linked_task(
+    asana_server, linear_server, asana_connector, linear_connector, project_id, team_id
+):
+    # a task which was written back once
+    task_id = asana_server.add_task(
+        project_id, "Alpha", "2024-01-08", "2024-01-19", linear_project=True
+    )
+    project = linear_server.projects[linear_server.add_project(team_id, "Alpha")]
+    project["updatedAt"] = "2024-01-01T00:00:00.000Z"
+    id_mapping = IdMappingIndex()
+
+    report = _sync(asana_connector, linear_connector, project_id, id_mapping)
+    assert report["written_back"] == 1
+    assert report["conflicts"] == 0
+    return task_id, project, id_mapping
+
+
+def test_linear_changes_are_written_back_on_every_run(
+    asana_server, asana_connector, linear_connector, project_id, linked_task
+):
+    task_id, project, id_mapping = linked_task
+
+    # the write back itself made the Asana task newer than the Linear project
+    for progress in [0.5, 0.75]:
+        project["progress"] = progress
+        report = _sync(asana_connector, linear_connector, project_id, id_mapping)
+
+        assert report["conflicts"] == 0
+        assert report["written_back"] == 1
+        assert _custom_field_value(asana_server, task_id, "Linear Progress") == str(
+            int(progress * 100)
+        )
+
+
+def test_write_back_skips_fields_edited_in_asana(
+    asana_server, asana_connector, linear_connector, project_id, linked_task
+):
+    task_id, project, id_mapping = linked_task
+    _set_custom_field(asana_server, task_id, "Linear State", "on hold")
+
+    # nothing new on Linear, the edit is kept
+    report = _sync(asana_connector, linear_connector, project_id, id_mapping)
+    assert report["written_back"] == 0
+    assert report["conflicts"] == 0
+
+    # both sides changed
+    project["state"] = "started"
+    project["updatedAt"] = "2100-01-01T00:00:00.000Z"
+    for _ in range(2):
+        report = _sync(asana_connector, linear_connector, project_id, id_mapping)
+        assert report["conflicts"] == 1
+        assert report["written_back"] == 0
+    assert _custom_field_value(asana_server, task_id, "Linear State") == "on hold"
+
+    # the conflict is resolved in Asana
+    _set_custom_field(asana_server, task_id, "Linear State", "started")
+    report = _sync(asana_connector, linear_connector, project_id, id_mapping)
+    assert report["conflicts"] == 0
+    project["state"] = "completed"
+    report = _sync(asana_connector, linear_connector, project_id, id_mapping)
+    assert report["written_back"] == 1
+    assert _custom_field_value(asana_server, task_id, "Linear State") == "completed"
+
+
+def test_synced_values_survive_restarts(
+    asana_server,
+    asana_connector,
+    linear_connector,
+    project_id,
+    linked_task,
+    tmp_path,
+):
+    task_id, project, id_mapping = linked_task
+    id_mapping.file_path = str(tmp_path / "id_mapping.json")
+    id_mapping.save()
+
+    project["progress"] = 0.5
+    id_mapping = IdMappingIndex(id_mapping.file_path)
+    report = _sync(asana_connector, linear_connector, project_id, id_mapping)
+
+    assert report["conflicts"] == 0
+    assert report["written_back"] == 1
+
+
+def test_without_synced_values_timestamps_decide(
+    asana_server, linear_server, asana_connector, linear_connector, project_id, team_id
+):
+    task_id = asana_server.add_task(
+        project_id, "Alpha", "2024-01-08", "2024-01-19", linear_project=True
+    )
+    _set_custom_field(asana_server, task_id, "Linear Progress", 20)
+    project = linear_server.projects[linear_server.add_project(team_id, "Alpha")]
+    project["progress"] = 0.5
+    project["updatedAt"] = "2024-01-01T00:00:00.000Z"
+
+    report = _sync(asana_connector, linear_connector, project_id)
+
+    assert report["conflicts"] == 1
+    assert report["written_back"] == 0
+    assert _custom_field_value(asana_server, task_id, "Linear Progress") == "20"
+
+    # linear wins after it was modified again
+    project["updatedAt"] = "2100-01-01T00:00:00.000Z"
+    report = _sync(asana_connector, linear_connector, project_id)
+
+    assert report["conflicts"] == 0
+    assert report["written_back"] == 1
+    assert _custom_field_value(asana_server, task_id, "Linear Progress") == "50"
+
+
+def test_state_set_by_the_sync_is_written_back_in_the_same_run(
+    asana_server, linear_server, asana_connector, linear_connector, project_id, team_id
+):
+    task_id = asana_server.add_task(
+        project_id,
+        "Alpha",
+        "2024-01-08",
+        "2024-01-19",
+        linear_project=True,
+        completed=True,
+    )
+    linear_server.add_project(team_id, "Alpha")
+
+    report = _sync(asana_connector, linear_connector, project_id, sync_projects=True)
+
+    assert report["written_back"] == 1
+    assert _custom_field_value(asana_server, task_id, "Linear State") == "completed"
+
+
+def test_custom_fields_are_resolved_per_workspace(
+    asana_server, linear_server, asana_connector, linear_connector, id_mapping_file
+):
+    task_ids = []
+    for workspace in ["U", "V"]:
+        workspace_id = asana_server.add_workspace(workspace)
+        project_id = asana_server.add_project(workspace_id, workspace)
+        task_id = asana_server.add_task(
+            project_id, workspace, "2024-01-08", "2024-01-19", linear_project=True
+        )
+        # the same custom field has a different gid in every workspace
+        for custom_field in asana_server.tasks[task_id]["custom_fields"]:
+            custom_field["gid"] = f"{workspace}_{custom_field['gid']}"
+        linear_server.add_team(workspace)
+        task_ids.append((project_id, task_id))
+
+    df_report = sync_many(
+        [
+            {"asana_project_id": project_id, "linear_team_name": team_name}
+            for (project_id, _), team_name in zip(task_ids, ["U", "V"])
+        ],
+        write_back_to_asana=True,
+        asana_connector=asana_connector,
+        linear_connector=linear_connector,
+        id_mapping=IdMappingIndex(id_mapping_file),
+    )
+
+    assert df_report.error.isna().all()
+    urls = {p["name"]: p["url"] for p in linear_server.projects.values()}
+    for workspace, (_, task_id) in zip(["U", "V"], task_ids):
+        assert (
+            _custom_field_value(asana_server, task_id, "Linear URL") == urls[workspace]
+        )
@@ -0,0 +1,211 @@
+import hashlib
+import hmac
+import json
+
+import pytest
+
+from asananas.allocation_management import _week_label, extract_allocation_data
+from asananas.asana_webhook import AsanaWebhookReceiver
+
+SECRET = "0123456789abcdef"
+
+
+def _event(action, task_id, parent=None):
+    # shape of the events as recorded from the Asana webhook api
+    return {
+        "user": {"gid": "1111", "resource_type": "user"},
+        "created_at": "2024-01-10T12:00:00.000Z",
+        "action": action,
+        "resource": {
+            "gid": task_id,
+            "resource_type": "task",
+            "resource_subtype": "default_task",
+        },
+        "parent": parent,
+        "change": (
+            {"field": "custom_fields", "action": "changed"}
+            if action == "changed"
+            else None
+        ),
+    }
+
+
+def _signed_request(events, secret=SECRET):
+    body = json.dumps({"events": events}).encode("utf-8")
+    signature = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return {"X-Hook-Signature": signature}, body
+
+
+def _expected_weekly_allocation(asana_connector, project_id):
+    df_allocation_data, _, _ = extract_allocation_data(
+        asana_connector.get_all_tasks_for_project(project_id)
+    )
+    df_allocation_data["week"] = df_allocation_data.date.apply(_week_label)
+    weekly = df_allocation_data.groupby(["name", "week"]).allocation.sum() / 5
+    return weekly.to_dict()
+
+
+def _assert_weekly_allocation(receiver, asana_connector, project_id):
+    expected = _expected_weekly_allocation(asana_connector, project_id)
+    actual = receiver.weekly_allocation
+    assert set(actual) == set(expected)
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value)
+
+
+@pytest.fixture
+def project(asana_server):
+    workspace_id = asana_server.add_workspace("Workspace")
+    project_id = asana_server.add_project(workspace_id, "Workstreams")
+    task_ids = {
+        "alpha": asana_server.add_task(
+            project_id, "Alpha", "2024-01-08", "2024-01-19", "Goofy: 50%, Pluto: 2d"
+        ),
+        "beta": asana_server.add_task(
+            project_id, "Beta", "2024-01-15", "2024-01-26", "Goofy: 30%"
+        ),
+        "gamma": asana_server.add_task(project_id, "Gamma", "2024-01-15", "2024-01-19"),
+    }
+    return project_id, task_ids
+
+
+@pytest.fixture
+def receiver(asana_connector, project):
+    project_id, _ = project
+    return AsanaWebhookReceiver(asana_connector, project_id, secret=SECRET)
+
+
+def test_initial_allocation_matches_extract(receiver, asana_connector, project):
+    _assert_weekly_allocation(receiver, asana_connector, project[0])
+    assert receiver.allocation_model.projects_with_no_allocation == ["Gamma"]
+
+
+def test_handshake_echoes_and_persists_secret(asana_connector, project, tmp_path):
+    secret_file = str(tmp_path / "secret")
+    receiver = AsanaWebhookReceiver(
+        asana_connector, project[0], secret_file=secret_file
+    )
+
+    status, headers = receiver.handle_request({"X-Hook-Secret": SECRET}, b"")
+    assert status == 200
+    assert headers == {"X-Hook-Secret": SECRET}
+
+    # a restarted receiver still accepts signed events
+    restarted = AsanaWebhookReceiver(
+        asana_connector, project[0], secret_file=secret_file
+    )
+    assert restarted.secret == SECRET
+    assert restarted.handle_request(*_signed_request([]))[0] == 200
+
+    # a second handshake with another secret is rejected
+    assert restarted.handle_request({"X-Hook-Secret": "other"}, b"")[0] == 403
+
+
+def test_events_without_valid_signature_are_rejected(receiver, project):
+    _, task_ids = project
+    headers, body = _signed_request([_event("deleted", task_ids["alpha"])])
+
+    assert receiver.handle_request({}, body)[0] == 401
+    assert receiver.handle_request({"X-Hook-Signature": "bad"}, body)[0] == 401
+    _, tampered_body = _signed_request([_event("deleted", task_ids["beta"])])
+    assert receiver.handle_request(headers, tampered_body)[0] == 401
+    other_headers, _ = _signed_request(
+        [_event("deleted", task_ids["alpha"])], secret="other"
+    )
+    assert receiver.handle_request(other_headers, body)[0] == 401
+
+    assert task_ids["alpha"] in receiver.allocation_model
+    assert receiver.pop_invalidated_person_weeks() == set()
+
+
+def test_changed_event_updates_allocation(
+    receiver, asana_server, asana_connector, project
+):
+    project_id, task_ids = project
+    task = asana_server.tasks[task_ids["alpha"]]
+    task["due_on"] = "2024-01-31"
+    task["custom_fields"][0]["text_value"] = "Goofy: 20%, Dingo: 50%"
+
+    status, _ = receiver.handle_request(
+        *_signed_request([_event("changed", task_ids["alpha"])])
+    )
+
+    assert status == 200
+    _assert_weekly_allocation(receiver, asana_connector, project_id)
+
+    # the old and the new person-weeks of the task are invalidated
+    invalidated = receiver.pop_invalidated_person_weeks()
+    assert ("Pluto", "2024-CW02") in invalidated
+    assert ("Dingo", "2024-CW05") in invalidated
+    assert ("Goofy", "2024-CW05") in invalidated
+    assert receiver.pop_invalidated_person_weeks() == set()
+
+
+def test_deleted_event_removes_task(receiver, asana_server, asana_connector, project):
+    project_id, task_ids = project
+    del asana_server.tasks[task_ids["beta"]]
+    asana_server.project_tasks[project_id].remove(task_ids["beta"])
+
+    status, _ = receiver.handle_request(
+        *_signed_request([_event("deleted", task_ids["beta"])])
+    )
+
+    assert status == 200
+    assert task_ids["beta"] not in receiver.allocation_model
+    _assert_weekly_allocation(receiver, asana_connector, project_id)
+    assert ("Goofy", "2024-CW04") in receiver.pop_invalidated_person_weeks()
+
+
+def test_removed_from_project_event_removes_task(
+    receiver, asana_server, asana_connector, project
+):
+    project_id, task_ids = project
+    asana_server.project_tasks[project_id].remove(task_ids["alpha"])
+    asana_server.tasks[task_ids["alpha"]]["memberships"] = []
+    parent = {"gid": project_id, "resource_type": "project"}
+
+    status, _ = receiver.handle_request(
+        *_signed_request([_event("removed", task_ids["alpha"], parent=parent)])
+    )
+
+    assert status == 200
+    assert task_ids["alpha"] not in receiver.allocation_model
+    _assert_weekly_allocation(receiver, asana_connector, project_id)
+
+
+def test_changed_event_for_deleted_task_does_not_fail_batch(
+    receiver, asana_server, asana_connector, project
+):
+    project_id, task_ids = project
+    del asana_server.tasks[task_ids["alpha"]]
+    asana_server.project_tasks[project_id].remove(task_ids["alpha"])
+    asana_server.tasks[task_ids["beta"]]["custom_fields"][0]["text_value"] = "Pete: 40%"
+
+    status, _ = receiver.handle_request(
+        *_signed_request(
+            [_event("changed", task_ids["alpha"]), _event("changed", task_ids["beta"])]
+        )
+    )
+
+    assert status == 200
+    assert task_ids["alpha"] not in receiver.allocation_model
+    _assert_weekly_allocation(receiver, asana_connector, project_id)
+
+
+def test_task_without_dates_is_a_broken_allocation(
+    receiver, asana_server, asana_connector, project
+):
+    project_id, task_ids = project
+    asana_server.tasks[task_ids["beta"]]["start_on"] = None
+
+    status, _ = receiver.handle_request(
+        *_signed_request([_event("changed", task_ids["beta"])])
+    )
+
+    assert status == 200
+    assert receiver.allocation_model.projects_with_broken_allocation == ["Beta"]
+    _assert_weekly_allocation(receiver, asana_connector, project_id)
+
+    # the receiver also starts with such a task
+    restarted = AsanaWebhookReceiver(asana_connector, project_id, secret=SECRET)
+    assert restarted.allocation_model.projects_with_broken_allocation == ["Beta"]
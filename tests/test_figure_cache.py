@@ -0,0 +1,147 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+
+from asananas import figure_cache as figure_cache_module
+from asananas.figure_cache import (
+    FigureCache,
+    cached_allocation_html,
+    cached_visualize_allocation_by_week,
+)
+
+
+def _allocation_data(allocation=0.5):
+    return pd.DataFrame(
+        [
+            {
+                "date": datetime(2024, 1, 8) + pd.Timedelta(days=i),
+                "name": name,
+                "allocation": allocation,
+                "project": "Alpha",
+            }
+            for i in range(5)
+            for name in ["Goofy", "Pluto"]
+        ]
+    )
+
+
+def _build(df, title="Figure"):
+    return go.Figure(layout={"title": title})
+
+
+def _other_build(df, title="Figure"):
+    return go.Figure(layout={"title": title, "width": 500})
+
+
+def test_key_depends_on_data_and_params():
+    cache = FigureCache()
+    df = _allocation_data()
+
+    assert cache.make_key(df, a=1) == cache.make_key(_allocation_data(), a=1)
+    assert cache.make_key(df, a=1) != cache.make_key(df, a=2)
+    assert cache.make_key(df, a=1) != cache.make_key(_allocation_data(0.4), a=1)
+    assert cache.make_key(df, a=1) != cache.make_key(df.rename(columns={"name": "n"}))
+
+
+def test_figures_are_built_once():
+    cache = FigureCache()
+    df = _allocation_data()
+
+    html = cached_allocation_html(df, current_date="2024-01-10", cache=cache)
+    assert cached_allocation_html(df, current_date="2024-01-10", cache=cache) == html
+    assert cache.stats == {"hits": 1, "disk_hits": 0, "misses": 1}
+
+    fig = cached_visualize_allocation_by_week(
+        df, current_date="2024-01-10", cache=cache
+    )
+    assert isinstance(fig, go.Figure)
+    assert cache.stats["misses"] == 2
+    assert cache.hit_rate == pytest.approx(1 / 3)
+
+
+def test_key_depends_on_build_code_and_versions(monkeypatch):
+    cache = FigureCache()
+    df = _allocation_data()
+
+    # e.g. a changed build function after an upgrade
+    monkeypatch.setattr(_other_build, "__name__", _build.__name__)
+    cache.get_html(df, _build)
+    cache.get_html(df, _other_build)
+    assert cache.stats["misses"] == 2
+
+    cache.get_html(df, _build)
+    assert cache.stats["hits"] == 1
+
+    monkeypatch.setattr(figure_cache_module, "__version__", "0.0.0")
+    cache.get_html(df, _build)
+    monkeypatch.setattr(figure_cache_module.plotly, "__version__", "0.0.0")
+    cache.get_html(df, _build)
+    assert cache.stats["misses"] == 4
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = FigureCache(max_entries=2)
+    df = _allocation_data()
+
+    cache.get_html(df, _build, title="a")
+    cache.get_html(df, _build, title="b")
+    cache.get_html(df, _build, title="a")
+    cache.get_html(df, _build, title="c")
+
+    cache.get_html(df, _build, title="a")
+    assert cache.stats["hits"] == 2
+    cache.get_html(df, _build, title="b")
+    assert cache.stats["misses"] == 4
+
+
+def test_disk_cache_is_shared(tmp_path):
+    df = _allocation_data()
+    html = FigureCache(cache_dir=str(tmp_path)).get_html(df, _build)
+
+    cache = FigureCache(cache_dir=str(tmp_path))
+    assert cache.get_html(df, _build) == html
+    assert cache.stats == {"hits": 0, "disk_hits": 1, "misses": 0}
+
+    cache.get_html(df, _build)
+    assert cache.stats["hits"] == 1
+
+
+def test_disk_cache_is_bounded(tmp_path):
+    df = _allocation_data()
+    cache = FigureCache(max_entries=2, cache_dir=str(tmp_path))
+    key_a = cache.make_key(df, title="a")
+    key_b = cache.make_key(df, title="b")
+    cache.put(key_a, "a")
+    cache.put(key_b, "b")
+    os.utime(tmp_path / key_a, (1000, 1000))
+    os.utime(tmp_path / key_b, (2000, 2000))
+
+    # a disk hit marks the entry as recently used
+    assert FigureCache(cache_dir=str(tmp_path)).get(key_a) == "a"
+    cache.put(cache.make_key(df, title="c"), "c")
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert not (tmp_path / key_b).exists()
+    assert (tmp_path / key_a).exists()
+
+
+def test_clear_and_reset_stats():
+    cache = FigureCache()
+    df = _allocation_data()
+    cache.get_html(df, _build)
+    cache.get_html(df, _build)
+
+    cache.clear()
+    assert cache.stats == {"hits": 1, "disk_hits": 0, "misses": 1}
+    cache.get_html(df, _build)
+    assert cache.stats["misses"] == 2
+
+    cache.reset_stats()
+    assert cache.stats == {"hits": 0, "disk_hits": 0, "misses": 0}
+    assert cache.hit_rate == 0.0
+    # the entries are kept
+    cache.get_html(df, _build)
+    assert cache.stats == {"hits": 1, "disk_hits": 0, "misses": 0}
@@ -0,0 +1,176 @@
+import pandas as pd
+
+from asananas.asana_linear_bridge import sync_asana_linear
+from asananas.id_mapping import IdMappingIndex, normalize_name
+from asananas.linear_connector import PROJECT_COLUMNS
+from asananas.schema import apply_asana_task_schema, apply_linear_project_schema
+
+TEAM_ID = "team"
+
+
+def _asana_tasks(*tasks):
+    return apply_asana_task_schema(
+        pd.DataFrame(
+            [
+                {
+                    "asana_task_id": gid,
+                    "asana_task_name": name,
+                    "asana_start_on": "2024-01-08",
+                    "asana_due_on": "2024-01-19",
+                    "asana_linear_project": True,
+                }
+                for gid, name in tasks
+            ]
+        )
+    )
+
+
+def _linear_projects(*projects):
+    return apply_linear_project_schema(
+        pd.DataFrame(
+            [
+                {"linear_project_id": project_id, "linear_project_name": name}
+                for project_id, name in projects
+            ],
+            columns=PROJECT_COLUMNS,
+        )
+    )
+
+
+def test_normalize_name():
+    assert normalize_name("  Alpha-Project!  ") == normalize_name("alpha project")
+    assert normalize_name(None) == ""
+
+
+def test_reconcile_joins_by_id_before_name():
+    id_mapping = IdMappingIndex()
+    id_mapping.link("a1", "p2", TEAM_ID)
+
+    df = id_mapping.reconcile(
+        _asana_tasks(("a1", "Alpha")),
+        _linear_projects(("p1", "Alpha"), ("p2", "Old name")),
+        TEAM_ID,
+    )
+
+    assert len(df) == 2
+    row = df[df.asana_task_id == "a1"].iloc[0]
+    assert row.linear_project_id == "p2"
+    orphan = df[df.linear_project_id == "p1"].iloc[0]
+    assert pd.isna(orphan.asana_task_id)
+
+
+def test_reconcile_falls_back_to_normalized_names_and_links():
+    id_mapping = IdMappingIndex()
+
+    df = id_mapping.reconcile(
+        _asana_tasks(("a1", "Alpha Project!"), ("a2", "Beta")),
+        _linear_projects(("p1", "alpha  project")),
+        TEAM_ID,
+    )
+
+    assert df.set_index("asana_task_id").loc["a1", "linear_project_id"] == "p1"
+    assert pd.isna(df.set_index("asana_task_id").loc["a2", "linear_project_id"])
+    assert id_mapping.get_linear_project_id("a1", TEAM_ID) == "p1"
+    assert id_mapping.get_asana_task_id("p1") == "a1"
+
+
+def test_reconcile_keeps_dtypes():
+    df_asana_tasks = _asana_tasks(("a1", "Alpha"))
+    df_linear_projects = _linear_projects(("p1", "Gamma"))
+
+    df = IdMappingIndex().reconcile(df_asana_tasks, df_linear_projects, TEAM_ID)
+
+    for column, dtype in {
+        **df_asana_tasks.dtypes.to_dict(),
+        **df_linear_projects.dtypes.to_dict(),
+    }.items():
+        assert df[column].dtype == dtype
+
+
+def test_link_is_one_to_one():
+    id_mapping = IdMappingIndex()
+    id_mapping.link("a1", "p1", TEAM_ID)
+    id_mapping.link("a2", "p1", TEAM_ID)
+
+    assert id_mapping.get_linear_project_id("a1", TEAM_ID) is None
+    assert id_mapping.get_asana_task_id("p1") == "a2"
+    assert len(id_mapping) == 1
+
+
+def test_save_and_load(tmp_path):
+    file_path = str(tmp_path / "mapping" / "id_mapping.json")
+    id_mapping = IdMappingIndex(file_path)
+    id_mapping.link("a1", "p1", TEAM_ID)
+    id_mapping.save()
+
+    assert IdMappingIndex(file_path).get_linear_project_id("a1", TEAM_ID) == "p1"
+
+
+def test_renamed_task_does_not_duplicate_linear_project(
+    asana_server, linear_server, asana_connector, linear_connector, id_mapping_file
+):
+    workspace_id = asana_server.add_workspace("Workspace")
+    project_id = asana_server.add_project(workspace_id, "Workstreams")
+    task_id = asana_server.add_task(
+        project_id, "Delta", "2024-01-08", "2024-01-19", linear_project=True
+    )
+    team_id = linear_server.add_team("Team")
+
+    def _sync():
+        # no id mapping passed, the default one is persisted between runs
+        return sync_asana_linear(
+            project_id,
+            None,
+            "Team",
+            None,
+            auto_create_linear_projects=True,
+            sync_projects=True,
+            cancel_linear_projects=True,
+            asana_connector=asana_connector,
+            linear_connector=linear_connector,
+        )
+
+    assert _sync()["created"] == 1
+    asana_server.tasks[task_id]["name"] = "Delta renamed"
+    report = _sync()
+
+    assert report["created"] == 0
+    assert report["cancelled"] == 0
+    assert [p["name"] for p in linear_server.projects.values()] == ["Delta renamed"]
+    id_mapping = IdMappingIndex(id_mapping_file)
+    assert id_mapping.get_linear_project_id(task_id, team_id) is not None
+
+
+def test_links_are_kept_per_team(tmp_path):
+    file_path = str(tmp_path / "id_mapping.json")
+    id_mapping = IdMappingIndex(file_path)
+    id_mapping.link("a1", "p1", "team u")
+    id_mapping.link("a1", "p2", "team v")
+    id_mapping.save()
+
+    id_mapping = IdMappingIndex(file_path)
+    assert id_mapping.get_linear_project_id("a1", "team u") == "p1"
+    assert id_mapping.get_linear_project_id("a1", "team v") == "p2"
+
+
+def test_synced_values_are_kept_with_the_link(tmp_path):
+    file_path = str(tmp_path / "id_mapping.json")
+    id_mapping = IdMappingIndex(file_path)
+    id_mapping.set_synced_values("a1", TEAM_ID, {"asana_linear_state": "planned"})
+    assert id_mapping.get_synced_values("a1", TEAM_ID) == {}
+
+    id_mapping.link("a1", "p1", TEAM_ID)
+    id_mapping.set_synced_values("a1", TEAM_ID, {"asana_linear_state": "planned"})
+    id_mapping.set_synced_values("a1", TEAM_ID, {"asana_linear_progress": 50})
+    id_mapping.link("a1", "p1", TEAM_ID)
+    id_mapping.save()
+
+    id_mapping = IdMappingIndex(file_path)
+    assert id_mapping.get_synced_values("a1", TEAM_ID) == {
+        "asana_linear_state": "planned",
+        "asana_linear_progress": 50,
+    }
+
+    # they belong to the Linear project, not to the task
+    id_mapping.link("a1", "p2", TEAM_ID)
+    assert id_mapping.get_synced_values("a1", TEAM_ID) == {}
@@ -0,0 +1,160 @@
+import pytest
+
+from asananas.asana_connector import AsanaConnector
+from asananas.instrumentation import (
+    MetricsRegistry,
+    PrometheusSink,
+    SpanSink,
+    metrics,
+)
+from asananas.mock_servers import MockAsanaServer
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def _asana_connector(server, max_retries):
+    connector = AsanaConnector(
+        access_token="mock", base_url=server.base_url, max_retries=max_retries
+    )
+    connector.client.RETRY_DELAY = 0.001
+    return connector
+
+
+def test_counters_and_timings(registry):
+    registry.increment("tasks")
+    registry.increment("tasks", 2)
+    registry.record_timing("fetch", 0.5)
+    registry.record_timing("fetch", 1.5)
+    with registry.timer("block"):
+        pass
+
+    counters, timings = registry.snapshot()
+    assert counters == {"tasks": 3}
+    assert timings["fetch"] == {"count": 2, "total": 2.0, "max": 1.5}
+    assert timings["block"]["count"] == 1
+
+    registry.reset()
+    assert registry.snapshot() == ({}, {})
+
+
+def test_timed_keeps_the_function(registry):
+    @registry.timed("double")
+    def double(x):
+        """Doubles x."""
+        return 2 * x
+
+    assert double(2) == 4
+    assert double.__name__ == "double"
+    assert double.__doc__ == "Doubles x."
+    assert registry.snapshot()[1]["double"]["count"] == 1
+
+
+def test_nested_spans_share_the_trace(registry):
+    sink = SpanSink()
+    registry.add_sink(sink)
+
+    with registry.timer("outer", project="Alpha"):
+        with registry.timer("inner"):
+            pass
+        with pytest.raises(ValueError):
+            with registry.timer("failing"):
+                raise ValueError()
+    with registry.timer("other"):
+        pass
+
+    inner, failing, outer, other = sink.spans
+    assert outer["parent_span_id"] is None
+    assert outer["attributes"] == {"project": "Alpha"}
+    assert inner["parent_span_id"] == outer["span_id"]
+    assert failing["parent_span_id"] == outer["span_id"]
+    assert inner["trace_id"] == failing["trace_id"] == outer["trace_id"]
+    assert other["trace_id"] != outer["trace_id"]
+    assert [s["status"] for s in sink.spans] == ["ok", "error", "ok", "ok"]
+    assert outer["start_time_unix_nano"] <= inner["start_time_unix_nano"]
+    assert inner["end_time_unix_nano"] <= outer["end_time_unix_nano"]
+
+    # the timing of a failed block is recorded as well
+    assert registry.snapshot()[1]["failing"]["count"] == 1
+
+
+def test_span_sink_keeps_the_latest_spans(registry):
+    sink = SpanSink(max_spans=3)
+    registry.add_sink(sink)
+
+    registry.increment("ignored")
+    for i in range(5):
+        with registry.timer(f"span{i}"):
+            pass
+
+    assert [s["name"] for s in sink.spans] == ["span2", "span3", "span4"]
+
+    registry.remove_sink(sink)
+    with registry.timer("span5"):
+        pass
+    assert len(sink.spans) == 3
+
+
+def test_prometheus_sink_renders_text_format(registry):
+    registry.increment("asana.requests", 3)
+    registry.increment("linear.bytes-sent", 10)
+    registry.record_timing("bridge.sync", 0.25)
+    registry.record_timing("bridge.sync", 0.5)
+
+    assert PrometheusSink(registry).render() == (
+        "# TYPE asananas_asana_requests_total counter\n"
+        "asananas_asana_requests_total 3\n"
+        "# TYPE asananas_linear_bytes_sent_total counter\n"
+        "asananas_linear_bytes_sent_total 10\n"
+        "# TYPE asananas_bridge_sync_seconds summary\n"
+        "asananas_bridge_sync_seconds_count 2\n"
+        "asananas_bridge_sync_seconds_sum 0.75\n"
+    )
+
+    # the process wide registry by default
+    metrics.increment("default")
+    assert "asananas_default_total 1" in PrometheusSink().render()
+
+
+def test_summary(registry):
+    registry.increment("b.counter", 2)
+    registry.record_timing("a.timing", 0.12345)
+
+    df = registry.summary()
+
+    assert list(df.metric) == ["a.timing", "b.counter"]
+    assert df.set_index("metric").loc["a.timing"].tolist() == [1, 0.123, 0.123]
+    assert df.set_index("metric")["count"]["b.counter"] == 2
+    assert MetricsRegistry().summary().empty
+
+
+def test_asana_retries_are_counted(asana_server):
+    workspace_id = asana_server.add_workspace("Workspace")
+    project_id = asana_server.add_project(workspace_id, "Workstreams")
+    asana_server.generate_tasks(project_id, 20)
+    asana_server.error_rate = 0.3
+    connector = _asana_connector(asana_server, max_retries=10)
+
+    assert len(connector.get_all_tasks_for_project(project_id)) == 20
+
+    counters, timings = metrics.snapshot()
+    assert asana_server.stats["injected_errors"] > 0
+    assert counters["asana.retries"] == asana_server.stats["injected_errors"]
+    assert counters.get("asana.errors", 0) == 0
+    assert counters["asana.requests"] == asana_server.stats["requests"]
+    assert timings["asana.request"]["count"] == asana_server.stats["requests"]
+
+
+def test_asana_errors_are_counted_once_retries_are_exhausted():
+    with MockAsanaServer(error_rate=1.0) as server:
+        connector = _asana_connector(server, max_retries=2)
+
+        with pytest.raises(Exception):
+            connector.get_workspaces()
+
+    counters, _ = metrics.snapshot()
+    assert counters["asana.requests"] == 3
+    assert counters["asana.retries"] == 2
+    assert counters["asana.errors"] == 1
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from asananas.leveling import level_allocations, moves_to_edits
+from asananas.scenarios import ScenarioEngine
+
+CURRENT_DATE = "2024-01-08"
+
+
+@pytest.fixture
+def df_allocation_data(make_allocation_data):
+    # Goofy is over-allocated in February, the started task cannot be moved
+    return make_allocation_data(
+        ("Alpha", "2024-02-05", "2024-02-16", "Goofy: 60%"),
+        ("Beta", "2024-02-05", "2024-02-16", "Goofy: 60%, Pluto: 50%"),
+        ("Started", "2024-01-01", "2024-02-16", "Goofy: 20%"),
+        ("Other", "2024-01-15", "2024-03-01", "Pluto: 50%"),
+    )
+
+
+def test_moves_resolve_over_allocation(df_allocation_data):
+    df_moves, df_summary = level_allocations(
+        df_allocation_data, current_date=CURRENT_DATE
+    )
+
+    assert len(df_moves) > 0
+    assert "Started" not in set(df_moves.project)
+
+    df_summary = df_summary.set_index("name")
+    assert df_summary.excess_person_weeks_before["Goofy"] > 0
+    assert df_summary.excess_person_weeks_after["Goofy"] == pytest.approx(0)
+    assert (
+        df_summary.excess_person_weeks_after
+        <= df_summary.excess_person_weeks_before + 1e-9
+    ).all()
+
+
+@pytest.mark.parametrize("slack_weeks", [1, 4])
+def test_moves_respect_slack_due_dates_and_the_past(df_allocation_data, slack_weeks):
+    df_moves, _ = level_allocations(
+        df_allocation_data, slack_weeks=slack_weeks, current_date=CURRENT_DATE
+    )
+
+    assert (df_moves.n_workdays.abs() <= slack_weeks * 5).all()
+    assert (df_moves.n_workdays < 0).all()
+    assert (df_moves.due_after <= df_moves.due_before).all()
+    assert (df_moves.start_after >= pd.Timestamp(CURRENT_DATE)).all()
+
+
+def test_delays_only_if_allowed(make_allocation_data):
+    df_allocation_data = make_allocation_data(
+        ("Alpha", "2024-01-08", "2024-01-12", "Goofy: 60%"),
+        ("Beta", "2024-01-08", "2024-01-12", "Goofy: 60%"),
+    )
+
+    df_moves, _ = level_allocations(df_allocation_data, current_date=CURRENT_DATE)
+    assert len(df_moves) == 0
+
+    df_moves, df_summary = level_allocations(
+        df_allocation_data, allow_delays=True, current_date=CURRENT_DATE
+    )
+    assert len(df_moves) == 1
+    assert df_moves.n_workdays[0] > 0
+    assert df_summary.excess_person_weeks_after.sum() == pytest.approx(0)
+
+
+def test_moves_to_edits_reproduces_leveled_load(df_allocation_data):
+    slack_weeks = 4
+    df_moves, df_summary = level_allocations(
+        df_allocation_data, slack_weeks=slack_weeks, current_date=CURRENT_DATE
+    )
+
+    engine = ScenarioEngine(df_allocation_data, padding_weeks=slack_weeks + 1)
+    today = engine.dates.searchsorted(pd.Timestamp(CURRENT_DATE))
+    load = engine.load_matrix(moves_to_edits(df_moves))[:, today:]
+
+    np.testing.assert_allclose(
+        load.max(axis=1), df_summary.peak_allocation_after, atol=1e-12
+    )
+
+    df_leveled = engine.to_allocation_data(moves_to_edits(df_moves))
+    for move in df_moves.itertuples():
+        dates = df_leveled[df_leveled.project == move.project].date
+        assert dates.min() == move.start_after
+        assert dates.max() == move.due_after
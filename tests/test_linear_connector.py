@@ -0,0 +1,85 @@
+import pytest
+
+from asananas import linear_connector as linear_connector_module
+from asananas.instrumentation import metrics
+from asananas.linear_connector import LinearConnector
+from asananas.mock_servers import MockLinearServer
+
+
+class _FailingCreateServer(MockLinearServer):
+    # answers the first ProjectCreate with a 500, either before or after the
+    # project was actually created
+    def __init__(self, fail_after_applying, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_after_applying = fail_after_applying
+        self.n_failures = 1
+
+    def handle(self, method, path, query, payload):
+        is_create = "ProjectCreate" in payload.get("query", "")
+        error = 500, {}, {"errors": [{"message": "Internal server error"}]}
+
+        if is_create and self.n_failures > 0 and not self.fail_after_applying:
+            self.n_failures -= 1
+            return error
+
+        response = super().handle(method, path, query, payload)
+
+        if is_create and self.n_failures > 0 and self.fail_after_applying:
+            self.n_failures -= 1
+            return error
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(linear_connector_module.time, "sleep", delays.append)
+    return delays
+
+
+def test_queries_are_retried_on_server_errors_and_rate_limits():
+    with MockLinearServer(error_rate=0.3, rate_limit=20, seed=1) as server:
+        server.add_team("Team")
+        connector = LinearConnector(
+            access_token="mock",
+            url=server.graphql_url,
+            max_retries=10,
+            retry_delay=0.001,
+        )
+        for _ in range(40):
+            connector.get_team_and_projects("Team")
+
+        assert server.stats["injected_errors"] > 0
+        assert server.stats["rate_limited"] > 0
+
+    counters, _ = metrics.snapshot()
+    n_failed = server.stats["injected_errors"] + server.stats["rate_limited"]
+    assert counters["linear.retries"] == n_failed
+    assert counters.get("linear.errors", 0) == 0
+
+
+def test_backoff_is_exponential_and_gives_up(sleeps):
+    with MockLinearServer() as server:
+        connector = LinearConnector(
+            access_token="mock", url=server.graphql_url, retry_delay=0.5
+        )
+        server.error_rate = 1.0
+
+        with pytest.raises(Exception):
+            connector.get_team_and_projects("Team")
+
+    assert sleeps == [0.5, 1.0, 2.0]
+
+
+@pytest.mark.parametrize("fail_after_applying", [True, False])
+def test_create_project_does_not_duplicate_on_server_error(fail_after_applying, sleeps):
+    with _FailingCreateServer(fail_after_applying) as server:
+        team_id = server.add_team("Team")
+        connector = LinearConnector(access_token="mock", url=server.graphql_url)
+
+        project_id = connector.create_project("Alpha", team_id, check_existing=False)
+
+        names = [p["name"] for p in server.projects.values()]
+        assert names == ["Alpha"]
+        assert project_id in server.projects
+        assert server.n_failures == 0
@@ -0,0 +1,100 @@
+import random
+
+import pandas as pd
+import pytest
+
+from asananas.load_index import LoadIndex
+
+
+@pytest.fixture
+def df_allocation_data(make_allocation_data):
+    return make_allocation_data(
+        ("Alpha", "2024-01-08", "2024-01-19", "Goofy: 50%, Pluto: 2d"),
+        ("Beta", "2024-01-15", "2024-01-26", "Goofy: 30%"),
+        ("Gamma", "2024-01-10", "2024-01-10", "Pluto: 100%"),
+        ("Delta", "2024-01-22", "2024-02-02", "Dingo: 20%"),
+    )
+
+
+@pytest.fixture
+def load_index(df_allocation_data):
+    return LoadIndex(df_allocation_data)
+
+
+def _direct_load(df_allocation_data, start, end, names=None):
+    df = df_allocation_data
+    in_range = (df.date >= pd.Timestamp(start)) & (df.date <= pd.Timestamp(end))
+    if names is not None:
+        in_range &= df.name.isin(names)
+    return df[in_range].allocation.sum()
+
+
+def test_range_sums_match_the_allocation_data(load_index, df_allocation_data):
+    days = pd.date_range("2024-01-01", "2024-02-11", freq="D")
+    rng = random.Random(0)
+    for _ in range(50):
+        start, end = sorted(rng.sample(list(days), 2))
+        for name in ["Goofy", "Pluto", "Dingo"]:
+            assert load_index.load(name, start, end) == pytest.approx(
+                _direct_load(df_allocation_data, start, end, [name])
+            )
+        assert load_index.total_load(start, end) == pytest.approx(
+            _direct_load(df_allocation_data, start, end)
+        )
+        assert load_index.total_load(
+            start, end, names=["Goofy", "Dingo"]
+        ) == pytest.approx(
+            _direct_load(df_allocation_data, start, end, ["Goofy", "Dingo"])
+        )
+
+
+def test_week_labels_cover_whole_weeks(load_index):
+    assert load_index.load("Goofy", "2024-CW03", "2024-CW03") == pytest.approx(4.0)
+    assert load_index.load("Goofy", "2024-CW02", "2024-CW04") == pytest.approx(
+        load_index.load("Goofy", "2024-01-08", "2024-01-28")
+    )
+    assert load_index.utilization("2024-CW03", "2024-CW03")["Goofy"] == pytest.approx(
+        0.8
+    )
+
+
+def test_unknown_people_and_empty_ranges(load_index):
+    assert load_index.load("Nobody", "2024-01-01", "2024-12-31") == 0.0
+    assert load_index.total_load("2024-01-10", "2024-01-09") == 0.0
+    assert load_index.total_load("2023-01-01", "2023-12-31") == 0.0
+    assert list(load_index.utilization("2024-01-13", "2024-01-14")) == [0.0] * 3
+
+
+def test_available_people_mean_vs_strict(load_index):
+    # on average Pluto is free enough, but fully booked on a single day
+    df = load_index.available_people("2024-CW02", "2024-CW02", fraction=0.6)
+    assert list(df.name) == ["Dingo", "Pluto"]
+    assert df.utilization.tolist() == pytest.approx([0.0, 0.4])
+    assert df.free_capacity.tolist() == pytest.approx([1.0, 0.6])
+
+    df = load_index.available_people(
+        "2024-CW02", "2024-CW02", fraction=0.6, strict=True
+    )
+    assert list(df.name) == ["Dingo"]
+
+    df = load_index.available_people(
+        "2024-CW05", "2024-CW05", fraction=0.8, strict=True
+    )
+    assert set(df.name) == {"Goofy", "Pluto", "Dingo"}
+    assert df.name.iloc[-1] == "Dingo"
+    assert df.peak_allocation.iloc[-1] == pytest.approx(0.2)
+
+    df = load_index.available_people(
+        "2024-CW05", "2024-CW05", names=["Dingo", "Nobody"]
+    )
+    assert list(df.name) == ["Dingo"]
+
+
+def test_empty_index():
+    load_index = LoadIndex(
+        pd.DataFrame(columns=["date", "name", "allocation", "project"])
+    )
+
+    assert load_index.names == []
+    assert load_index.total_load("2024-01-01", "2024-01-31") == 0.0
+    assert len(load_index.available_people("2024-CW01", "2024-CW04")) == 0
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from asananas.scenarios import Reassign, Scale, ScenarioEngine, Shift
+
+
+def _daily_load(df_allocation_data, engine, names=None):
+    # person x workday load on the axis of the engine
+    names = engine.names if names is None else names
+    return (
+        df_allocation_data.assign(date=pd.to_datetime(df_allocation_data.date))
+        .pivot_table(index="name", columns="date", values="allocation", aggfunc="sum")
+        .reindex(index=names, columns=engine.dates, fill_value=0)
+        .fillna(0)
+        .to_numpy()
+    )
+
+
+def _assert_load(actual, expected):
+    # the cumulative sums leave rounding errors where the load drops to zero
+    np.testing.assert_allclose(actual, expected, atol=1e-12)
+
+
+@pytest.fixture
+def df_allocation_data(make_allocation_data):
+    return make_allocation_data(
+        ("Alpha", "2024-01-08", "2024-01-19", "Goofy: 50%, Pluto: 2d"),
+        ("Beta", "2024-01-15", "2024-01-26", "Goofy: 30%"),
+        ("Gamma", "2024-01-10", "2024-01-12", "Pluto: 100%"),
+    )
+
+
+@pytest.fixture
+def engine(df_allocation_data):
+    return ScenarioEngine(df_allocation_data, padding_weeks=2)
+
+
+def test_base_load_matches_allocation_data(engine, df_allocation_data):
+    assert engine.names == ["Goofy", "Pluto"]
+    assert engine.projects == ["Alpha", "Beta", "Gamma"]
+    _assert_load(engine.load_matrix(), _daily_load(df_allocation_data, engine))
+
+    df = engine.to_allocation_data()
+    assert len(df) == len(df_allocation_data)
+    assert df.allocation.sum() == pytest.approx(df_allocation_data.allocation.sum())
+
+
+def test_shift_moves_workdays(engine, df_allocation_data):
+    load = engine.load_matrix([Shift("Gamma", 5)])
+
+    df_shifted = df_allocation_data.copy()
+    gamma = df_shifted.project == "Gamma"
+    df_shifted.loc[gamma, "date"] = df_shifted.date[gamma] + pd.Timedelta(weeks=1)
+    _assert_load(load, _daily_load(df_shifted, engine))
+
+
+def test_scale_by_project_and_person(engine, df_allocation_data):
+    load = engine.load_matrix([Scale(2.0, project="Alpha", name="Goofy")])
+
+    df_scaled = df_allocation_data.copy()
+    scaled = (df_scaled.project == "Alpha") & (df_scaled.name == "Goofy")
+    df_scaled.loc[scaled, "allocation"] *= 2
+    _assert_load(load, _daily_load(df_scaled, engine))
+
+
+def test_reassign_keeps_the_total_load(engine):
+    load = engine.load_matrix([Reassign("Pluto", "Goofy", fraction=0.25)])
+    base = engine.load_matrix()
+
+    _assert_load(load.sum(axis=0), base.sum(axis=0))
+    _assert_load(load[1], base[1] * 0.75)
+
+
+def test_reassign_to_new_person_does_not_change_engine(engine, df_allocation_data):
+    edits = [Reassign("Goofy", "Newbie", project="Beta")]
+
+    load = engine.load_matrix(edits)
+    df_scenario = engine.to_allocation_data(edits)
+
+    assert engine.names == ["Goofy", "Pluto"]
+    assert engine.scenario_names(edits) == ["Goofy", "Pluto", "Newbie"]
+    assert load.shape == (3, len(engine.dates))
+    assert set(df_scenario.name) == {"Goofy", "Pluto", "Newbie"}
+
+    # the base plan and unrelated scenarios are not affected
+    assert engine.load_matrix().shape == (2, len(engine.dates))
+    with pytest.raises(Exception):
+        engine.load_matrix([Scale(2.0, name="Newbie")])
+
+
+def test_evaluate_scenarios(engine):
+    df = engine.evaluate(
+        {
+            "base": [],
+            "newbie": [Reassign("Goofy", "Newbie")],
+            "double": [Scale(2.0)],
+        }
+    )
+
+    df = df.set_index("scenario")
+    assert df.peak_allocation["base"] == pytest.approx(engine.load_matrix().max())
+    assert (
+        df.over_allocated_person_days["newbie"] <= df.over_allocated_person_days["base"]
+    )
+    assert df.excess_person_weeks["double"] > df.excess_person_weeks["base"]
+    assert engine.names == ["Goofy", "Pluto"]
@@ -0,0 +1,107 @@
+import pandas as pd
+import pytest
+
+from asananas.asana_connector import TASK_COLUMNS
+from asananas.linear_connector import PROJECT_COLUMNS
+from asananas.schema import (
+    ASANA_TASK_DTYPES,
+    LINEAR_PROJECT_DTYPES,
+    apply_asana_task_schema,
+    apply_linear_project_schema,
+    parse_date,
+)
+
+
+def _asana_tasks():
+    return pd.DataFrame(
+        [
+            {
+                "asana_task_id": "1",
+                "asana_task_name": "Alpha",
+                "asana_start_on": "2024-01-08",
+                "asana_due_on": "2024-01-19",
+                "asana_completed": False,
+                "asana_assignee": "Goofy",
+                "asana_url": "https://app.asana.com/0/1/1",
+                "asana_linear_project": True,
+                "asana_section": "Research",
+                "asana_allocation": "Goofy: 50%",
+                "asana_modified_at": "2024-01-05T10:00:00.000Z",
+                "asana_linear_progress": None,
+                "asana_linear_state": None,
+                "asana_linear_url": None,
+            },
+            {
+                "asana_task_id": "2",
+                "asana_task_name": "Beta",
+                "asana_start_on": None,
+                "asana_due_on": None,
+                "asana_completed": True,
+                "asana_assignee": None,
+                "asana_url": "https://app.asana.com/0/1/2",
+                "asana_linear_project": False,
+                "asana_section": None,
+                "asana_allocation": None,
+                "asana_modified_at": None,
+                "asana_linear_progress": 50.0,
+                "asana_linear_state": "started",
+                "asana_linear_url": "https://linear.app/p/1",
+            },
+        ],
+        columns=TASK_COLUMNS,
+    )
+
+
+def test_parse_date():
+    assert parse_date(None) is None
+    assert parse_date(float("nan")) is None
+    assert parse_date("2024-01-08") == pd.Timestamp("2024-01-08")
+
+
+def test_asana_task_schema_applies_declared_dtypes():
+    df = apply_asana_task_schema(_asana_tasks())
+
+    for column, dtype in ASANA_TASK_DTYPES.items():
+        assert df[column].dtype == dtype, column
+    assert pd.isna(df.asana_start_on[1])
+
+    # applying the schema again changes nothing
+    pd.testing.assert_frame_equal(apply_asana_task_schema(df), df)
+
+
+@pytest.mark.parametrize("n_rows", [0, 2])
+def test_linear_project_schema_applies_declared_dtypes(n_rows):
+    projects = [
+        {
+            "linear_project_id": "p1",
+            "linear_project_name": "Alpha",
+            "linear_start_date": "2024-01-08",
+            "linear_target_date": None,
+            "linear_state": "planned",
+            "linear_url": "https://linear.app/p/1",
+            "linear_progress": 0.5,
+            "linear_updated_at": None,
+        }
+    ] * n_rows
+    df = apply_linear_project_schema(pd.DataFrame(projects, columns=PROJECT_COLUMNS))
+
+    for column, dtype in LINEAR_PROJECT_DTYPES.items():
+        assert df[column].dtype == dtype, column
+
+
+def test_naive_timestamps_are_localized_to_utc():
+    df = apply_asana_task_schema(
+        pd.DataFrame({"asana_modified_at": pd.to_datetime(["2024-01-05 10:00"])})
+    )
+    assert df.asana_modified_at.dtype == ASANA_TASK_DTYPES["asana_modified_at"]
+    assert df.asana_modified_at[0] == pd.Timestamp("2024-01-05 10:00", tz="UTC")
+
+
+def test_linear_progress_is_parsed_to_numbers():
+    df = apply_asana_task_schema(
+        pd.DataFrame({"asana_linear_progress": [50, "12.5", None, "n/a"]})
+    )
+
+    assert df.asana_linear_progress.dtype == "Float64"
+    assert df.asana_linear_progress.tolist()[:2] == [50.0, 12.5]
+    assert df.asana_linear_progress.isna().tolist() == [False, False, True, True]
@@ -0,0 +1,139 @@
+import json
+import time
+
+import pytest
+
+from asananas.id_mapping import IdMappingIndex
+from asananas.sync_orchestrator import RateLimiter, load_sync_config, sync_many
+
+
+def _sync_many(pairs, asana_connector, linear_connector, id_mapping_file):
+    return sync_many(
+        pairs,
+        asana_connector=asana_connector,
+        linear_connector=linear_connector,
+        id_mapping=IdMappingIndex(id_mapping_file),
+    )
+
+
+def _project_names(linear_server, team_id):
+    return sorted(
+        p["name"] for p in linear_server.projects.values() if p["team_id"] == team_id
+    )
+
+
+@pytest.fixture
+def workspace_id(asana_server):
+    return asana_server.add_workspace("Workspace")
+
+
+def test_rate_limiter_limits_rate():
+    rate_limiter = RateLimiter(rate=50, burst=1)
+    t0 = time.monotonic()
+    for _ in range(11):
+        rate_limiter.acquire()
+    assert time.monotonic() - t0 >= 0.18
+
+
+def test_load_sync_config(tmp_path):
+    file_path = tmp_path / "sync.json"
+    file_path.write_text(json.dumps([{"asana_project_id": "1"}]))
+    with pytest.raises(Exception):
+        load_sync_config(str(file_path))
+
+    pairs = [{"asana_project_id": "1", "linear_team_name": "Team"}]
+    file_path.write_text(json.dumps(pairs))
+    assert load_sync_config(str(file_path)) == pairs
+
+
+def test_sync_many_syncs_every_pair(
+    asana_server,
+    linear_server,
+    asana_connector,
+    linear_connector,
+    workspace_id,
+    id_mapping_file,
+):
+    project_a = asana_server.add_project(workspace_id, "A")
+    project_b = asana_server.add_project(workspace_id, "B")
+    asana_server.add_task(
+        project_a, "A1", "2024-01-08", "2024-01-19", linear_project=True
+    )
+    asana_server.add_task(project_a, "A2", "2024-01-08", "2024-01-19")
+    asana_server.add_task(
+        project_b, "B1", "2024-01-08", "2024-01-19", linear_project=True
+    )
+    team_u = linear_server.add_team("U")
+    team_v = linear_server.add_team("V")
+    linear_server.add_project(team_v, "Orphan")
+
+    df_report = _sync_many(
+        [
+            {"asana_project_id": project_a, "linear_team_name": "U"},
+            {"asana_project_id": project_b, "linear_team_name": "V"},
+        ],
+        asana_connector,
+        linear_connector,
+        id_mapping_file,
+    ).set_index("linear_team_name")
+
+    assert df_report.error.isna().all()
+    assert df_report.loc["U", "created"] == 1
+    assert df_report.loc["V", "created"] == 1
+    assert df_report.loc["V", "cancelled"] == 1
+    assert _project_names(linear_server, team_u) == ["A1"]
+    assert _project_names(linear_server, team_v) == ["B1", "Orphan"]
+
+
+def test_project_synced_to_two_teams_survives_rename(
+    asana_server,
+    linear_server,
+    asana_connector,
+    linear_connector,
+    workspace_id,
+    id_mapping_file,
+):
+    project_id = asana_server.add_project(workspace_id, "Workstreams")
+    task_id = asana_server.add_task(
+        project_id, "Delta", "2024-01-08", "2024-01-19", linear_project=True
+    )
+    team_u = linear_server.add_team("U")
+    team_v = linear_server.add_team("V")
+    pairs = [
+        {"asana_project_id": project_id, "linear_team_name": "U"},
+        {"asana_project_id": project_id, "linear_team_name": "V"},
+    ]
+
+    _sync_many(pairs, asana_connector, linear_connector, id_mapping_file)
+    asana_server.tasks[task_id]["name"] = "Delta renamed"
+    df_report = _sync_many(pairs, asana_connector, linear_connector, id_mapping_file)
+
+    assert (df_report.created == 0).all()
+    assert _project_names(linear_server, team_u) == ["Delta renamed"]
+    assert _project_names(linear_server, team_v) == ["Delta renamed"]
+
+
+def test_canceled_projects_are_not_canceled_again(
+    asana_server,
+    linear_server,
+    asana_connector,
+    linear_connector,
+    workspace_id,
+    id_mapping_file,
+):
+    project_id = asana_server.add_project(workspace_id, "Workstreams")
+    asana_server.add_task(
+        project_id, "Alpha", "2024-01-08", "2024-01-19", linear_project=True
+    )
+    team_id = linear_server.add_team("U")
+    orphan_id = linear_server.add_project(team_id, "Orphan")
+    pairs = [{"asana_project_id": project_id, "linear_team_name": "U"}]
+
+    df_report = _sync_many(pairs, asana_connector, linear_connector, id_mapping_file)
+    assert df_report.cancelled[0] == 1
+    assert linear_server.projects[orphan_id]["state"] == "canceled"
+
+    df_report = _sync_many(pairs, asana_connector, linear_connector, id_mapping_file)
+    assert df_report.error.isna().all()
+    assert df_report.created[0] == 0
+    assert df_report.cancelled[0] == 0